@@ -0,0 +1,137 @@
+"""
+Measure the per-turn Python overhead of the chat queries with and without prebuilt
+statements.
+
+``before`` builds a new ``select``/``insert`` for every call and stores messages with an
+ORM ``add``/``commit``/``refresh``, which is what the chat path did before statements
+were cached per table. ``after`` is the current code:
+``DatabaseManager.cache_statements`` reuses one statement per query shape and messages
+are stored with the cached ``INSERT ... RETURNING``.
+
+Turns run one after the other against a temporary SQLite file, so the time is dominated
+by Python rather than I/O. Two numbers are reported per mode: the full chat turn (load
+the history, store the user message, store the assistant message) and just building the
+history query. The chat history cache is disabled, so every turn runs the history query.
+
+Usage:
+    python benchmarks/chat_statements.py --turns 500 --rounds 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.pop("HIVE_AGENT_ID", None)
+os.environ.pop("HIVE_SWARM_ID", None)
+os.environ["HIVE_AGENT_CHAT_CACHE_SESSIONS"] = "0"
+
+from hive_agent.chat import ChatManager  # noqa: E402
+from hive_agent.database.database import (  # noqa: E402
+    DatabaseManager,
+    get_database,
+    setup_chats_table,
+)
+
+
+class BeforeDatabaseManager(DatabaseManager):
+    cache_statements = False
+
+    async def enqueue_insert(self, table_name, data):
+        await self.insert_data(table_name, data)
+
+
+MODES = {"before": BeforeDatabaseManager, "after": DatabaseManager}
+
+
+async def time_turns(database, manager_class, turns: int) -> float:
+    chat_manager = ChatManager(
+        None, user_id="bench_user", session_id=f"session_{manager_class.__name__}"
+    )
+    async with database.session() as db:
+        db_manager = manager_class(db, database=database)
+        started = time.perf_counter()
+        for turn in range(turns):
+            await chat_manager.get_messages(db_manager)
+            await chat_manager.add_message(db_manager, "user", f"question {turn}")
+            await chat_manager.add_message(db_manager, "assistant", f"answer {turn}")
+        return (time.perf_counter() - started) / turns
+
+
+async def time_query_build(database, manager_class, iterations: int) -> float:
+    async with database.session() as db:
+        db_manager = manager_class(db, database=database)
+        columns = await db_manager.get_table_definition("chats")
+        model = await db_manager._get_model("chats", columns)
+        filters = {"user_id": ["bench_user"], "session_id": ["session"]}
+        started = time.perf_counter()
+        for _ in range(iterations):
+            db_manager._build_read_query(model, columns, filters)
+        return (time.perf_counter() - started) / iterations
+
+
+async def run(turns: int, rounds: int) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        database = get_database(
+            f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}"
+        )
+        await database.initialize()
+        async with database.session() as db:
+            await setup_chats_table(db)
+
+        results = {mode: {"turn": [], "build": []} for mode in MODES}
+        # Warm up connections, mapped classes and the compiled cache in both modes
+        for manager_class in MODES.values():
+            await time_turns(database, manager_class, 20)
+        # Alternate the modes so drift affects both equally; the history keeps growing,
+        # so keep it short enough that fetching rows doesn't hide the statement overhead
+        for _ in range(rounds):
+            for mode, manager_class in MODES.items():
+                results[mode]["turn"].append(
+                    await time_turns(database, manager_class, turns)
+                )
+                results[mode]["build"].append(
+                    await time_query_build(database, manager_class, turns * 10)
+                )
+            async with database.session() as db:
+                await DatabaseManager(db, database=database).delete_where(
+                    "chats", {"user_id": ["bench_user"]}
+                )
+
+        await database.dispose()
+        return {
+            mode: {
+                name: statistics.median(samples) * 1e6
+                for name, samples in timings.items()
+            }
+            for mode, timings in results.items()
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--turns", type=int, default=200, help="chat turns per round")
+    parser.add_argument(
+        "--rounds", type=int, default=5, help="rounds per mode; the median is reported"
+    )
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.turns, args.rounds))
+    print(f"{args.turns} turns x {args.rounds} rounds, median per turn")
+    print(f"{'mode':<10}{'turn us':>12}{'query build us':>18}")
+    for mode, result in results.items():
+        print(f"{mode:<10}{result['turn']:>12.1f}{result['build']:>18.1f}")
+    before, after = results["before"], results["after"]
+    saved, speedup = before["turn"] - after["turn"], before["turn"] / after["turn"]
+    print(f"turn overhead saved: {saved:.1f} us ({speedup:.2f}x)")
+    print(f"query build: {before['build'] / after['build']:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
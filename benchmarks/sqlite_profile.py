@@ -0,0 +1,140 @@
+"""
+Compare chat-turn throughput on the embedded SQLite database with and without the tuned
+profile.
+
+Each profile runs in a fresh process against its own database file, because the pragmas
+are read from the environment when the engine is created. A chat turn is what
+``ChatManager.generate_response`` does against the database: load the session history,
+store the user message and store the assistant message. The chat history cache is
+disabled, so every turn reads its history from the database.
+
+Usage:
+    python benchmarks/sqlite_profile.py --sessions 20 --turns 25
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+PROFILES = ("default", "tuned")
+# The child processes import hive_agent from this checkout, wherever the script runs
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def run_turns(sessions: int, turns: int) -> dict:
+    from hive_agent.chat import ChatManager
+    from hive_agent.database.database import (
+        DatabaseManager,
+        get_database,
+        setup_chats_table,
+    )
+
+    database = get_database()
+    await database.initialize()
+    async with database.session() as db:
+        await setup_chats_table(db)
+
+    latencies = []
+
+    async def chat_session(session_index: int):
+        chat_manager = ChatManager(
+            None, user_id="bench_user", session_id=f"session_{session_index}"
+        )
+        for turn in range(turns):
+            started = time.perf_counter()
+            async with database.session() as db:
+                db_manager = DatabaseManager(db, database=database)
+                await chat_manager.get_messages(db_manager)
+                await chat_manager.add_message(db_manager, "user", f"question {turn}")
+                await chat_manager.add_message(
+                    db_manager, "assistant", f"answer {turn}"
+                )
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[chat_session(index) for index in range(sessions)])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "turns": len(latencies),
+        "seconds": round(elapsed, 3),
+        "turns_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+    }
+
+
+def run_profile(profile: str, sessions: int, turns: int) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        database_path = os.path.join(workdir, "bench.db")
+        env = dict(os.environ)
+        env.update(
+            {
+                "HIVE_AGENT_DATABASE_URL": f"sqlite+aiosqlite:///{database_path}",
+                "HIVE_AGENT_DB_SQLITE_PROFILE": profile,
+                "HIVE_AGENT_CHAT_CACHE_SESSIONS": "0",
+                "PYTHONPATH": os.pathsep.join(
+                    filter(None, [REPO_ROOT, env.get("PYTHONPATH")])
+                ),
+            }
+        )
+        env.pop("HIVE_AGENT_ID", None)
+        env.pop("HIVE_SWARM_ID", None)
+        output = subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                "--child",
+                "--sessions",
+                str(sessions),
+                "--turns",
+                str(turns),
+            ],
+            cwd=workdir,
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--sessions", type=int, default=20, help="concurrent chat sessions"
+    )
+    parser.add_argument("--turns", type=int, default=25, help="chat turns per session")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run_turns(args.sessions, args.turns))))
+        return
+
+    results = {
+        profile: run_profile(profile, args.sessions, args.turns) for profile in PROFILES
+    }
+    print(f"{args.sessions} concurrent sessions x {args.turns} turns")
+    print(f"{'profile':<10}{'turns/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'seconds':>10}")
+    for profile, result in results.items():
+        print(
+            f"{profile:<10}{result['turns_per_second']:>10}{result['p50_ms']:>10}"
+            f"{result['p95_ms']:>10}{result['seconds']:>10}"
+        )
+    speedup = (
+        results["tuned"]["turns_per_second"] / results["default"]["turns_per_second"]
+    )
+    print(f"tuned / default throughput: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,61 +1,304 @@
+import logging
 import os
 from datetime import datetime, timezone
-from typing import Any, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
+import anyio
 from llama_index.core.agent.runner.base import AgentRunner
 from llama_index.core.llms import ChatMessage, MessageRole
 from llama_index.core.memory import ChatMemoryBuffer
 from llama_index.core.schema import ImageDocument
 
-from hive_agent.database.database import DatabaseManager
+from hive_agent.chat.history_cache import ChatHistoryCache, SessionKey, get_history_cache
+from hive_agent.chat.history_window import HistoryWindow
+from hive_agent.database.database import DatabaseManager, naive_utc
+
+logger = logging.getLogger(__name__)
 
 
 class ChatManager:
 
-    def __init__(self, llm: AgentRunner, user_id: str, session_id: str, enable_multi_modal: bool = False):
+    def __init__(
+        self,
+        llm: AgentRunner,
+        user_id: str,
+        session_id: str,
+        enable_multi_modal: bool = False,
+        history_cache: Optional[ChatHistoryCache] = None,
+        history_window: Optional[HistoryWindow] = None,
+    ):
         self.llm = llm
         self.user_id = user_id
         self.session_id = session_id
         self.chat_store_key = f"{user_id}_{session_id}"
         self.enable_multi_modal = enable_multi_modal
+        self.history_cache = history_cache
+        self.history_window = history_window if history_window is not None else HistoryWindow.from_env()
 
-    async def add_message(self, db_manager: DatabaseManager, role: str, content: Any | None):
+    def _history_cache(self, db_manager: DatabaseManager) -> Optional[ChatHistoryCache]:
+        # Histories are cached per database; managers without one (e.g. test doubles) aren't cached
+        if self.history_cache is not None:
+            return self.history_cache
+        database = getattr(db_manager, "database", None)
+        return get_history_cache(database) if database is not None else None
+
+    def _session_key(self) -> SessionKey:
+        return (self.user_id, self.session_id, os.getenv("HIVE_AGENT_ID"), os.getenv("HIVE_SWARM_ID"))
+
+    def _message_row(self, role: str, content: Any | None) -> Dict[str, Any]:
         data = {
             "user_id": self.user_id,
             "session_id": self.session_id,
             "message": content,
             "role": role,
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": naive_utc(datetime.now(timezone.utc)),
         }
         if "HIVE_AGENT_ID" in os.environ:
             data["agent_id"] = os.getenv("HIVE_AGENT_ID", "")
         if "HIVE_SWARM_ID" in os.environ:
             data["swarm_id"] = os.getenv("HIVE_SWARM_ID", "")
+        return data
 
-        await db_manager.insert_data(
+    async def add_message(self, db_manager: DatabaseManager, role: str, content: Any | None):
+        await db_manager.enqueue_insert(
             table_name="chats",
-            data=data,
+            data=self._message_row(role, content),
         )
 
-    async def get_messages(self, db_manager: DatabaseManager):
-        filters = {"user_id": [self.user_id], "session_id": [self.session_id]}
+        history_cache = self._history_cache(db_manager)
+        if history_cache is not None:
+            history_cache.append(self._session_key(), ChatMessage(role=role, content=content))
+
+    async def add_turn(self, db_manager: DatabaseManager, user_row: Dict[str, Any], assistant_message: Any | None):
+        """
+        Store a turn's user message (staged by ``_start_turn``) and the answer in one transaction.
+
+        The write is shielded from cancellation (e.g. a client disconnecting mid-response), so once an
+        answer exists the turn is stored whole.
+        """
+        rows = [user_row, self._message_row(MessageRole.ASSISTANT, assistant_message)]
+        with anyio.CancelScope(shield=True):
+            await db_manager.enqueue_insert_many("chats", rows)
+
+        history_cache = self._history_cache(db_manager)
+        if history_cache is not None:
+            for row in rows:
+                history_cache.append(self._session_key(), ChatMessage(role=row["role"], content=row["message"]))
+
+    @staticmethod
+    def _add_time_window(filters: dict, since: Optional[datetime], until: Optional[datetime]):
+        # Messages from since (inclusive) to until (exclusive), served by the (user_id, timestamp) index
+        window = {}
+        if since is not None:
+            window["gte"] = naive_utc(since)
+        if until is not None:
+            window["lt"] = naive_utc(until)
+        if window:
+            filters["timestamp"] = window
+
+    def _session_filters(self) -> Dict[str, Any]:
+        filters: Dict[str, Any] = {"user_id": [self.user_id], "session_id": [self.session_id]}
         if "HIVE_AGENT_ID" in os.environ:
             filters["agent_id"] = [os.getenv("HIVE_AGENT_ID", "")]
         if "HIVE_SWARM_ID" in os.environ:
             filters["swarm_id"] = [os.getenv("HIVE_SWARM_ID", "")]
+        return filters
 
-        db_chat_history = await db_manager.read_data("chats", filters)
+    async def get_messages(
+        self,
+        db_manager: DatabaseManager,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ):
+        filters = self._session_filters()
+        self._add_time_window(filters, since, until)
+
+        # Only whole histories are cached, time-windowed reads always go to the database
+        history_cache = self._history_cache(db_manager) if since is None and until is None else None
+        if history_cache is None:
+            db_chat_history = await db_manager.read_data("chats", filters)
+            return [ChatMessage(role=chat["role"], content=chat["message"]) for chat in db_chat_history]
+
+        key = self._session_key()
+        chat_history = history_cache.get(key)
+        if chat_history is not None:
+            return chat_history
+        token = history_cache.begin_load(key)
+        try:
+            db_chat_history = await db_manager.read_data("chats", filters)
+        except Exception:
+            history_cache.end_load(key)
+            raise
         chat_history = [ChatMessage(role=chat["role"], content=chat["message"]) for chat in db_chat_history]
+        history_cache.set(key, chat_history, token)
+        return chat_history
+
+    async def get_history_window(self, db_manager: DatabaseManager) -> List[ChatMessage]:
+        """
+        The part of the session sent to the LLM under ``history_window``: the rolling summary of older
+        messages (if any) as a system message, then the newest messages in order.
+        """
+        window = self.history_window
+        llm = self._summary_llm() if window.summarize else None
+        summary = await self._get_summary(db_manager) if llm is not None else None
+
+        filters = self._session_filters()
+        if summary is not None and summary["last_message_id"] is not None:
+            filters["id"] = {"gt": summary["last_message_id"]}
+        recent = await self._read_recent(db_manager, filters)
+
+        if llm is not None and recent:
+            # Messages that left the window but aren't in the summary yet
+            pending_filters = {**filters, "id": {**filters.get("id", {}), "lt": min(chat["id"] for chat in recent)}}
+            pending = await db_manager.read_data(
+                "chats", pending_filters, limit=window.max_fold, order_by=["timestamp"], fields=["id", "role", "message"]
+            )
+            folded = False
+            if len(pending) >= window.summary_batch:
+                last_message_id = summary["last_message_id"] if summary is not None else None
+                summary = await self._fold_summary(db_manager, llm, summary, pending)
+                folded = summary is not None and summary["last_message_id"] != last_message_id
+            if not folded:
+                # Not summarized yet (or the summary couldn't be updated), so sent as they are
+                recent = pending + recent
+
+        chat_history = [ChatMessage(role=chat["role"], content=chat["message"]) for chat in recent]
+        if summary is not None and summary["summary"]:
+            chat_history.insert(0, window.summary_message(summary["summary"]))
         return chat_history
 
-    async def get_all_chats_for_user(self, db_manager: DatabaseManager):
-        filters = {"user_id": [self.user_id]}
+    async def _read_recent(self, db_manager: DatabaseManager, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        # Newest first with a LIMIT, then back to chronological order
+        window = self.history_window
+        fields = ["id", "role", "message", "timestamp"]
+        if window.max_tokens is None:
+            recent = await db_manager.read_data(
+                "chats", filters, limit=window.max_messages, order_by=["-timestamp"], fields=fields
+            )
+            return recent[::-1]
+
+        recent: List[Dict[str, Any]] = []
+        tokens = 0
+        cursor = None
+        while True:
+            limit = window.page_size
+            if window.max_messages is not None:
+                limit = min(limit, window.max_messages - len(recent))
+            page, cursor = await db_manager.read_page(
+                "chats", filters, limit=limit, order_by=["-timestamp"], cursor=cursor, fields=fields
+            )
+            for chat in page:
+                tokens += window.count_tokens(chat["message"])
+                if tokens > window.max_tokens:
+                    return recent[::-1]
+                recent.append(chat)
+            if cursor is None or len(recent) == window.max_messages:
+                return recent[::-1]
+
+    def _summary_llm(self):
+        # The LLM behind the agent runner; without one (e.g. a bare test double) nothing is summarized
+        llm = getattr(getattr(self.llm, "agent_worker", None), "_llm", None)
+        return llm if hasattr(llm, "achat") else None
+
+    def _summary_filters(self) -> Dict[str, Any]:
+        filters: Dict[str, Any] = {"user_id": [self.user_id], "session_id": [self.session_id]}
+        if "HIVE_AGENT_ID" in os.environ:
+            filters["agent_id"] = [os.getenv("HIVE_AGENT_ID", "")]
+        return filters
+
+    async def _get_summary(self, db_manager: DatabaseManager) -> Optional[Dict[str, Any]]:
+        summaries = await db_manager.read_data(
+            "chat_summaries",
+            self._summary_filters(),
+            limit=1,
+            fields=["id", "summary", "last_message_id", "message_count"],
+        )
+        return summaries[0] if summaries else None
+
+    async def _fold_summary(
+        self,
+        db_manager: DatabaseManager,
+        llm: Any,
+        summary: Optional[Dict[str, Any]],
+        messages: List[Dict[str, Any]],
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            response = await llm.achat(self.history_window.summary_request(summary and summary["summary"], messages))
+        except Exception as e:
+            # Keep the previous summary; the messages are folded on a later turn
+            logger.warning(f"Could not update the summary of session {self.session_id}: {e}")
+            return summary
+
+        data = {
+            "summary": str(response.message.content or ""),
+            "last_message_id": max(message["id"] for message in messages),
+            "message_count": (summary["message_count"] if summary else 0) + len(messages),
+            "updated_at": naive_utc(datetime.now(timezone.utc)),
+        }
+        if summary is not None:
+            await db_manager.update_data("chat_summaries", summary["id"], data)
+            return {**summary, **data}
+
+        data.update({key: values[0] for key, values in self._summary_filters().items()})
+        row = await db_manager.insert_data("chat_summaries", data)
+        return {**data, "id": row.id}
+
+    def _user_filters(self, since: Optional[datetime], until: Optional[datetime]) -> Dict[str, Any]:
+        filters: Dict[str, Any] = {"user_id": [self.user_id]}
         if "HIVE_AGENT_ID" in os.environ:
             filters["agent_id"] = [os.getenv("HIVE_AGENT_ID", "")]
         if "HIVE_SWARM_ID" in os.environ:
             filters["swarm_id"] = [os.getenv("HIVE_SWARM_ID", "")]
+        self._add_time_window(filters, since, until)
+        return filters
+
+    @staticmethod
+    def _isoformat(timestamp: Any) -> Any:
+        return timestamp.replace(tzinfo=timezone.utc).isoformat() if isinstance(timestamp, datetime) else timestamp
 
-        db_chat_history = await db_manager.read_data("chats", filters)
+    async def get_sessions_for_user(
+        self,
+        db_manager: DatabaseManager,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        The user's sessions, most recently active first, without their messages: the message count,
+        first and last timestamps and a preview of the last message. Returns the next page's cursor.
+        """
+        sessions, next_cursor = await db_manager.read_chat_sessions(
+            self._user_filters(since, until), limit=limit, cursor=cursor
+        )
+        for session in sessions:
+            session["first_timestamp"] = self._isoformat(session["first_timestamp"])
+            session["last_timestamp"] = self._isoformat(session["last_timestamp"])
+        return sessions, next_cursor
+
+    async def get_all_chats_for_user(
+        self,
+        db_manager: DatabaseManager,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        session_ids: Optional[List[str]] = None,
+        messages_per_session: Optional[int] = None,
+    ):
+        filters = self._user_filters(since, until)
+        if session_ids is not None:
+            filters["session_id"] = session_ids
+
+        if messages_per_session is None:
+            db_chat_history = await db_manager.read_data("chats", filters)
+        else:
+            # Only the newest messages of each session, picked in the database
+            db_chat_history = await db_manager.read_latest_per_group(
+                "chats",
+                "session_id",
+                messages_per_session,
+                filters,
+                fields=["session_id", "message", "role", "timestamp"],
+            )
 
         chats_by_session: dict[str, list] = {}
         for chat in db_chat_history:
@@ -66,7 +309,7 @@ class ChatManager:
                 {
                     "message": chat["message"],
                     "role": chat["role"],
-                    "timestamp": chat["timestamp"],
+                    "timestamp": self._isoformat(chat["timestamp"]),
                 }
             )
 
@@ -78,27 +321,74 @@ class ChatManager:
         last_message: ChatMessage,
         image_document_paths: Optional[List[str]] = [],
     ) -> str:
-        chat_history = []
-
-        if db_manager is not None:
-            chat_history = await self.get_messages(db_manager)
-            await self.add_message(db_manager, last_message.role.value, last_message.content)
+        chat_history, user_row = await self._start_turn(db_manager, last_message)
 
         if self.enable_multi_modal:
-            image_documents = (
-                [ImageDocument(image_path=image_path) for image_path in image_document_paths]
-                if image_document_paths is not None and len(image_document_paths) > 0
-                else []
+            assistant_message = await self._handle_openai_multimodal(
+                last_message, chat_history, self._image_documents(image_document_paths)
             )
-            assistant_message = await self._handle_openai_multimodal(last_message, chat_history, image_documents)
         else:
             assistant_message = await self._handle_openai_agent(last_message, chat_history)
 
         if db_manager is not None:
-            await self.add_message(db_manager, MessageRole.ASSISTANT, assistant_message)
+            await self.add_turn(db_manager, user_row, assistant_message)
 
         return assistant_message
 
+    async def stream_response(
+        self,
+        db_manager: Optional[DatabaseManager],
+        last_message: ChatMessage,
+        image_document_paths: Optional[List[str]] = [],
+    ) -> AsyncIterator[str]:
+        """
+        Like ``generate_response``, but yields the answer token by token as the LLM produces it.
+
+        The turn is stored once the stream ends. If it is cancelled or fails part way (e.g. the client
+        disconnected), whatever was produced until then is stored as the answer; if nothing was, the
+        turn isn't stored at all.
+        Multi-modal agents don't stream their steps, so their answer is yielded in one piece.
+        """
+        chat_history, user_row = await self._start_turn(db_manager, last_message)
+
+        tokens: List[str] = []
+        completed = False
+        try:
+            if self.enable_multi_modal:
+                tokens.append(
+                    await self._handle_openai_multimodal(
+                        last_message, chat_history, self._image_documents(image_document_paths)
+                    )
+                )
+                yield tokens[-1]
+            else:
+                response_stream = await self.llm.astream_chat(last_message.content, chat_history=chat_history)
+                async for token in response_stream.async_response_gen():
+                    tokens.append(token)
+                    yield token
+            completed = True
+        finally:
+            if db_manager is not None and (completed or tokens):
+                await self.add_turn(db_manager, user_row, "".join(tokens))
+
+    async def _start_turn(
+        self, db_manager: Optional[DatabaseManager], last_message: ChatMessage
+    ) -> Tuple[List[ChatMessage], Dict[str, Any]]:
+        # Load the history sent with the new message and stage the message's row. It is only stored
+        # with the answer (add_turn), so a failed LLM call leaves no unanswered message behind
+        user_row = self._message_row(last_message.role.value, last_message.content)
+        if db_manager is None:
+            return [], user_row
+        if self.history_window is not None:
+            chat_history = await self.get_history_window(db_manager)
+        else:
+            chat_history = await self.get_messages(db_manager)
+        return chat_history, user_row
+
+    @staticmethod
+    def _image_documents(image_document_paths: Optional[List[str]]) -> List[ImageDocument]:
+        return [ImageDocument(image_path=image_path) for image_path in image_document_paths or []]
+
     async def _handle_openai_multimodal(
         self,
         last_message: ChatMessage,
@@ -0,0 +1,181 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from llama_index.core.llms import ChatMessage
+
+SessionKey = Tuple[Optional[str], ...]
+
+
+class ChatHistoryCache:
+    """
+    LRU cache of recent session histories, so a turn doesn't re-read its whole session
+    from ``chats``.
+
+    ``ChatManager.get_messages`` fills it on a miss and ``add_message`` appends to a
+    cached history as it stores a message (write-through), so cached histories stay
+    complete. At most ``max_sessions`` histories and ``max_messages`` messages in total
+    are kept; the least recently used sessions are evicted first, and a session longer
+    than ``max_messages`` is not cached. The cache only sees writes made through this
+    process; when several processes serve the same sessions, ``ttl`` (in seconds) bounds
+    how long a history can miss messages stored elsewhere. Updates, deletes (including
+    retention passes) and imports on the chats table clear it, see
+    ``get_history_cache``.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        max_messages: int = 100000,
+        ttl: Optional[float] = None,
+    ):
+        if max_sessions < 1 or max_messages < 1:
+            raise ValueError("max_sessions and max_messages must be positive")
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self._entries: "OrderedDict[SessionKey, Tuple[List[ChatMessage], float]]" = (
+            OrderedDict()
+        )
+        # Sessions being read from the database: [readers, messages stored since the
+        # first read began]
+        self._loads: Dict[SessionKey, List[int]] = {}
+        self.messages = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: SessionKey) -> Optional[List[ChatMessage]]:
+        entry = self._entries.get(key)
+        if (
+            entry is not None
+            and self.ttl is not None
+            and time.monotonic() - entry[1] > self.ttl
+        ):
+            self.invalidate(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return list(entry[0])
+
+    def begin_load(self, key: SessionKey) -> int:
+        """
+        Call before reading a history from the database; pass the result to ``set`` or
+        ``end_load``.
+        """
+        load = self._loads.setdefault(key, [0, 0])
+        load[0] += 1
+        return load[1]
+
+    def end_load(self, key: SessionKey):
+        """Finish a load without caching it, e.g. when the read failed."""
+        load = self._loads[key]
+        load[0] -= 1
+        if not load[0]:
+            del self._loads[key]
+
+    def set(
+        self, key: SessionKey, history: List[ChatMessage], token: Optional[int] = None
+    ):
+        """
+        Cache ``history`` for ``key``. With the ``token`` from ``begin_load``, it is
+        dropped instead when a message was stored for the session after the read began
+        and so may be missing from it.
+        """
+        if token is not None:
+            load = self._loads[key]
+            stale = load[1] != token
+            self.end_load(key)
+            if stale:
+                return
+        self.invalidate(key)
+        if len(history) > self.max_messages:
+            return
+        self._entries[key] = (list(history), time.monotonic())
+        self.messages += len(history)
+        self._evict()
+
+    def append(self, key: SessionKey, message: ChatMessage):
+        """
+        Add a message just stored for ``key``; sessions that aren't cached are left to
+        the next read.
+        """
+        load = self._loads.get(key)
+        if load is not None:
+            load[1] += 1
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        entry[0].append(message)
+        self.messages += 1
+        self._entries.move_to_end(key)
+        self._evict()
+
+    def invalidate(self, key: SessionKey):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.messages -= len(entry[0])
+
+    def clear(self):
+        self._entries.clear()
+        self.messages = 0
+        # Histories being read may predate whatever made the cache stale, so they aren't
+        # cached either
+        for load in self._loads.values():
+            load[1] += 1
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_sessions or self.messages > self.max_messages
+        ):
+            _, (history, _) = self._entries.popitem(last=False)
+            self.messages -= len(history)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "sessions": len(self._entries),
+            "messages": self.messages,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+        }
+
+
+_caches: Dict[str, Optional[ChatHistoryCache]] = {}
+
+
+def get_history_cache(database: Any) -> Optional[ChatHistoryCache]:
+    """
+    Return the history cache shared by everything using ``database``, or None when it is
+    disabled.
+
+    ``HIVE_AGENT_CHAT_CACHE_SESSIONS`` (default ``1000``, ``0`` disables the cache),
+    ``HIVE_AGENT_CHAT_CACHE_MESSAGES`` (default ``100000``) and
+    ``HIVE_AGENT_CHAT_CACHE_TTL`` (seconds, no expiry by default) configure it.
+    """
+    if database.url not in _caches:
+        max_sessions = int(os.getenv("HIVE_AGENT_CHAT_CACHE_SESSIONS") or 1000)
+        ttl = os.getenv("HIVE_AGENT_CHAT_CACHE_TTL")
+        cache = (
+            ChatHistoryCache(
+                max_sessions=max_sessions,
+                max_messages=int(os.getenv("HIVE_AGENT_CHAT_CACHE_MESSAGES") or 100000),
+                ttl=float(ttl) if ttl else None,
+            )
+            if max_sessions > 0
+            else None
+        )
+        if cache is not None:
+            # Rows changed other than by appending may be in any cached history
+            database.change_listeners.append(
+                lambda table_name: table_name == "chats" and cache.clear()
+            )
+        _caches[database.url] = cache
+    return _caches[database.url]
@@ -0,0 +1,103 @@
+import os
+from typing import Callable, List, Optional
+
+from llama_index.core.llms import ChatMessage
+
+SUMMARY_PROMPT = (
+    "You keep a running summary of a conversation between a user and an assistant. "
+    "Update the summary with the new messages below. Keep facts, names, decisions, "
+    "open questions and the user's preferences; leave out small talk. Reply with the "
+    "updated summary only."
+)
+
+
+class HistoryWindow:
+    """
+    How much of a session ``ChatManager.generate_response`` sends to the LLM.
+
+    Only the newest ``max_messages`` messages, and as many of the newest as fit in
+    ``max_tokens``, are read; the read is ``ORDER BY timestamp DESC LIMIT`` so it costs
+    the same however long the session is. With ``summarize``, messages that leave the
+    window are folded into a rolling summary kept in ``chat_summaries`` and sent as a
+    system message ahead of the window. Until ``summary_batch`` messages have left the
+    window they are sent as they are, so the summary is updated once per batch rather
+    than every turn, and a fold takes at most ``max_fold`` messages, so a long session
+    that starts using a window catches up over several turns.
+    """
+
+    def __init__(
+        self,
+        max_messages: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        summarize: bool = True,
+        summary_batch: int = 10,
+        max_fold: int = 200,
+        page_size: int = 50,
+        tokenizer: Optional[Callable[[str], List]] = None,
+    ):
+        if max_messages is None and max_tokens is None:
+            raise ValueError("A history window needs max_messages or max_tokens")
+        if (max_messages is not None and max_messages < 1) or (
+            max_tokens is not None and max_tokens < 1
+        ):
+            raise ValueError("max_messages and max_tokens must be positive")
+        if summary_batch < 1 or max_fold < summary_batch:
+            raise ValueError(
+                "summary_batch must be positive and no larger than max_fold"
+            )
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        self.summarize = summarize
+        self.summary_batch = summary_batch
+        self.max_fold = max_fold
+        self.page_size = page_size
+        self._tokenizer = tokenizer
+
+    @classmethod
+    def from_env(cls) -> Optional["HistoryWindow"]:
+        """
+        Build the window from ``HIVE_AGENT_CHAT_HISTORY_MESSAGES`` and
+        ``HIVE_AGENT_CHAT_HISTORY_TOKENS``, or return None (the whole history is sent)
+        when neither is set. ``HIVE_AGENT_CHAT_HISTORY_SUMMARY`` (default ``true``) and
+        ``HIVE_AGENT_CHAT_HISTORY_SUMMARY_BATCH`` (default ``10``) configure the
+        summary.
+        """
+        max_messages = os.getenv("HIVE_AGENT_CHAT_HISTORY_MESSAGES")
+        max_tokens = os.getenv("HIVE_AGENT_CHAT_HISTORY_TOKENS")
+        if not max_messages and not max_tokens:
+            return None
+        return cls(
+            max_messages=int(max_messages) if max_messages else None,
+            max_tokens=int(max_tokens) if max_tokens else None,
+            summarize=os.getenv("HIVE_AGENT_CHAT_HISTORY_SUMMARY", "true").lower()
+            in ("1", "true", "yes"),
+            summary_batch=int(os.getenv("HIVE_AGENT_CHAT_HISTORY_SUMMARY_BATCH") or 10),
+        )
+
+    def count_tokens(self, text: Optional[str]) -> int:
+        if self._tokenizer is None:
+            from llama_index.core.utils import get_tokenizer
+
+            self._tokenizer = get_tokenizer()
+        return len(self._tokenizer(str(text or "")))
+
+    @staticmethod
+    def summary_message(summary: str) -> ChatMessage:
+        return ChatMessage(
+            role="system", content=f"Summary of the earlier conversation:\n{summary}"
+        )
+
+    @staticmethod
+    def summary_request(
+        summary: Optional[str], messages: List[dict]
+    ) -> List[ChatMessage]:
+        transcript = "\n".join(
+            f"{message['role']}: {message['message']}" for message in messages
+        )
+        request = (
+            f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"
+        )
+        return [
+            ChatMessage(role="system", content=SUMMARY_PROMPT),
+            ChatMessage(role="user", content=request),
+        ]
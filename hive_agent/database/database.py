@@ -1,9 +1,53 @@
+import asyncio
+import base64
+import bisect
+import codecs
+import csv
+import functools
+import hashlib
+import io
+import json
 import logging
 import os
-from typing import Any, Dict, List, Optional
+import re
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from inspect import isasyncgenfunction
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple, Union
 
 from dotenv import load_dotenv
-from sqlalchemy import JSON, Column, DateTime, Integer, MetaData, String, Table, Text, select
+from sqlalchemy import (
+    JSON,
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    and_,
+    bindparam,
+    cast,
+    delete,
+    false,
+    func,
+    insert,
+    inspect,
+    literal_column,
+    or_,
+    select,
+    event,
+    text,
+    true,
+    update,
+)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import make_url
+from sqlalchemy.schema import CreateIndex
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
@@ -14,18 +58,108 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-os.makedirs("hive-agent-data/db", exist_ok=True)
-db_url = os.getenv("HIVE_AGENT_DATABASE_URL") or "sqlite+aiosqlite:///hive-agent-data/db/hive_agent.db"
+DEFAULT_DATABASE_URL = "sqlite+aiosqlite:///hive-agent-data/db/hive_agent.db"
 
-poolclass = None
-connect_args = {}
 
-if db_url.startswith("postgresql+asyncpg://"):
-    connect_args = {"statement_cache_size": 0}
-    poolclass = NullPool
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """
+    Build the ``create_async_engine`` keyword arguments for ``url`` from the environment.
+
+    Postgres connections are pooled and keep asyncpg's prepared statement cache by default.
+    ``HIVE_AGENT_DB_PGBOUNCER=true`` switches to the pgbouncer-compatible mode instead: no
+    client-side pool, no statement cache and uniquely named prepared statements.
+    """
+    if not url.startswith("postgresql+asyncpg://"):
+        return {"connect_args": {}}
+
+    if _env_flag("HIVE_AGENT_DB_PGBOUNCER", False):
+        return {
+            "poolclass": NullPool,
+            "connect_args": {
+                "statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+            },
+        }
+
+    options: Dict[str, Any] = {
+        "pool_pre_ping": _env_flag("HIVE_AGENT_DB_POOL_PRE_PING", True),
+        "pool_recycle": _env_int("HIVE_AGENT_DB_POOL_RECYCLE", 1800),
+        "connect_args": {"statement_cache_size": _env_int("HIVE_AGENT_DB_STATEMENT_CACHE_SIZE", 100)},
+    }
+    pool_class = os.getenv("HIVE_AGENT_DB_POOL_CLASS", "queue").strip().lower()
+    if pool_class == "queue":
+        options["pool_size"] = _env_int("HIVE_AGENT_DB_POOL_SIZE", 5)
+        options["max_overflow"] = _env_int("HIVE_AGENT_DB_MAX_OVERFLOW", 10)
+    elif pool_class == "null":
+        options["poolclass"] = NullPool
+    else:
+        raise ValueError(f"Unsupported HIVE_AGENT_DB_POOL_CLASS: {pool_class}")
+    return options
+
+
+# Applied to every SQLite connection unless HIVE_AGENT_DB_SQLITE_PROFILE=default
+SQLITE_TUNED_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 268435456,
+    "cache_size": -64000,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+
+def sqlite_pragmas() -> Dict[str, Any]:
+    """
+    Return the pragmas for SQLite connections.
+
+    ``HIVE_AGENT_DB_SQLITE_PROFILE`` selects ``tuned`` (the default) or ``default`` (stock SQLite), and
+    ``HIVE_AGENT_DB_SQLITE_PRAGMAS`` overrides single pragmas, e.g. ``cache_size=-16000,mmap_size=0``.
+    """
+    profile = os.getenv("HIVE_AGENT_DB_SQLITE_PROFILE", "tuned").strip().lower()
+    if profile == "tuned":
+        pragmas: Dict[str, Any] = dict(SQLITE_TUNED_PRAGMAS)
+    elif profile == "default":
+        pragmas = {}
+    else:
+        raise ValueError(f"Unsupported HIVE_AGENT_DB_SQLITE_PROFILE: {profile}")
+
+    for item in (os.getenv("HIVE_AGENT_DB_SQLITE_PRAGMAS") or "").split(","):
+        if item.strip():
+            name, _, value = item.partition("=")
+            if not value.strip():
+                raise ValueError(f"Invalid HIVE_AGENT_DB_SQLITE_PRAGMAS entry: {item}")
+            pragmas[name.strip()] = value.strip()
+    return pragmas
+
+
+def configure_sqlite(async_engine, pragmas: Dict[str, Any]):
+    if not pragmas:
+        return
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+# Keys are column names or JSON paths such as "details.address.city". A list of values is an IN
+# filter, a dict maps operators from DatabaseManager.filter_operators (or "contains") to operands
+Filters = Dict[str, Union[List[Any], Dict[str, Any]]]
 
-engine = create_async_engine(db_url, echo=False, connect_args=connect_args, poolclass=poolclass)
-SessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)  # type: ignore
 Base = declarative_base()
 
 
@@ -34,19 +168,62 @@ class TableDefinition(Base):  # type: ignore
     id = Column(Integer, primary_key=True, index=True)
     table_name = Column(String, unique=True, index=True)
     columns = Column(JSON)
+    indexes = Column(JSON, nullable=True)
+
+
+CHATS_INDEXES = [
+    {"columns": ["user_id", "session_id", "timestamp"]},
+    # Time-window queries across all sessions of a user
+    {"columns": ["user_id", "timestamp"]},
+    # Retention by age, across all users
+    {"columns": ["timestamp"]},
+]
 
+CHATS_COLUMNS = {
+    "user_id": "String",
+    "session_id": "String",
+    "message": "String",
+    "role": "String",
+    "timestamp": "DateTime",
+    "agent_id": "String",
+}
 
-async def initialize_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+
+# Rolling summaries of the chat history that has left the history window, see hive_agent.chat.history_window
+CHAT_SUMMARIES_COLUMNS = {
+    "user_id": "String",
+    "session_id": "String",
+    "agent_id": "String",
+    "summary": "Text",
+    "last_message_id": "Integer",
+    "message_count": "Integer",
+    "updated_at": "DateTime",
+}
+
+CHAT_SUMMARIES_INDEXES = [{"columns": ["user_id", "session_id"]}]
+
+
+def naive_utc(value: datetime) -> datetime:
+    """``value`` in UTC without tzinfo, which is how ``DateTime`` columns store timestamps."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _migrate_table_definitions(conn):
+    existing = {column["name"] for column in inspect(conn).get_columns(TableDefinition.__tablename__)}
+    if "indexes" not in existing:
+        logger.info("Adding 'indexes' column to 'table_definitions'.")
+        conn.execute(text(f"ALTER TABLE {TableDefinition.__tablename__} ADD COLUMN indexes JSON"))
+
+
+async def initialize_db(database: Optional["Database"] = None):
+    await (database or get_database()).initialize()
 
 
 async def get_db():
-    async with SessionLocal() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+    async for session in get_database().get_db():
+        yield session
 
 
 async def setup_chats_table(db: AsyncSession):
@@ -55,36 +232,645 @@ async def setup_chats_table(db: AsyncSession):
 
     if table_exists:
         logger.info("Table 'chats' already exists. Skipping creation.")
-        return
+        if table_exists.get("timestamp") == "String":
+            await _migrate_chats_timestamp(db_manager, table_exists)
+        # Databases created before chats had indexes get them here
+        await db_manager.ensure_indexes("chats", CHATS_INDEXES)
+    else:
+        await db_manager.create_table("chats", CHATS_COLUMNS, CHATS_INDEXES)
+        logger.info("Table 'chats' created successfully.")
+
+    if not await db_manager.get_table_definition("chat_summaries"):
+        await db_manager.create_table("chat_summaries", CHAT_SUMMARIES_COLUMNS, CHAT_SUMMARIES_INDEXES)
+        logger.info("Table 'chat_summaries' created successfully.")
+
+
+async def _migrate_chats_timestamp(db_manager: "DatabaseManager", columns: Dict[str, str], batch_size: int = 5000):
+    """
+    Convert ``chats.timestamp`` from ISO strings to a native ``DateTime`` holding naive UTC.
+
+    Postgres changes the column type in place. SQLite keeps its column but rewrites every value into
+    the format of ``DateTime`` columns, a batch at a time; values that cannot be parsed become NULL.
+    """
+    logger.info("Migrating 'chats.timestamp' from String to DateTime.")
+    db = db_manager.db
+    try:
+        if db_manager.database.dialect == "postgresql":
+            await db.execute(
+                text(
+                    'ALTER TABLE chats ALTER COLUMN "timestamp" TYPE TIMESTAMP WITHOUT TIME ZONE '
+                    """USING ("timestamp"::timestamptz AT TIME ZONE 'UTC')"""
+                )
+            )
+        else:
+            chats = Table("chats", MetaData(), Column("id", Integer), Column("timestamp", DateTime))
+            statement = (
+                update(chats).where(chats.c.id == bindparam("row_id")).values(timestamp=bindparam("new_timestamp"))
+            )
+            last_id = 0
+            while True:
+                result = await db.execute(
+                    text("SELECT id, timestamp FROM chats WHERE id > :last_id ORDER BY id LIMIT :batch_size"),
+                    {"last_id": last_id, "batch_size": batch_size},
+                )
+                rows = result.all()
+                if not rows:
+                    break
+                values = []
+                for row_id, value in rows:
+                    try:
+                        timestamp = naive_utc(datetime.fromisoformat(value)) if value else None
+                    except (TypeError, ValueError):
+                        logger.warning(f"Unparseable timestamp {value!r} in chats row {row_id}, storing NULL.")
+                        timestamp = None
+                    values.append({"row_id": row_id, "new_timestamp": timestamp})
+                await db.execute(statement, values)
+                last_id = rows[-1][0]
+
+        result = await db.execute(select(TableDefinition).filter_by(table_name="chats"))
+        table_definition = result.scalars().first()
+        table_definition.columns = {**columns, "timestamp": "DateTime"}
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Error migrating 'chats.timestamp': {str(e)}")
+        raise ValueError(f"Error migrating chats: {str(e)}")
+
+    db_manager.definition_cache.invalidate("chats")
+    db_manager.model_registry.invalidate("chats")
+    logger.info("Migrated 'chats.timestamp' to DateTime.")
+
+
+class ModelRegistry:
+    """
+    Per-process registry of the mapped classes generated for dynamic tables.
+
+    Entries are keyed by table name plus a hash of the column definition, so a table whose
+    definition has not changed reuses one mapped class and is only checked against the
+    database (``create_all``) the first time it is used.
+    """
+
+    def __init__(self):
+        self._models: Dict[Tuple[str, str], Any] = {}
+        # table name -> (columns dict, model) of the last lookup, so a definition served from
+        # TableDefinitionCache (the same dict every time) is matched without hashing it again
+        self._latest: Dict[str, Tuple[Dict[str, str], Any]] = {}
+
+    @staticmethod
+    def definition_hash(columns: Dict[str, str]) -> str:
+        return hashlib.sha1(json.dumps(columns, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, table_name: str, columns: Dict[str, str]):
+        latest = self._latest.get(table_name)
+        if latest is not None and latest[0] is columns:
+            return latest[1]
+        model = self._models.get((table_name, self.definition_hash(columns)))
+        if model is not None:
+            self._latest[table_name] = (columns, model)
+        return model
+
+    def register(self, table_name: str, columns: Dict[str, str], model: Any):
+        self._models[(table_name, self.definition_hash(columns))] = model
+        self._latest[table_name] = (columns, model)
+
+    def invalidate(self, table_name: str):
+        for key in [key for key in self._models if key[0] == table_name]:
+            del self._models[key]
+        self._latest.pop(table_name, None)
+
+    def clear(self):
+        self._models.clear()
+        self._latest.clear()
+
+
+class TableDefinitionCache:
+    """
+    In-memory cache of table definitions, so CRUD calls don't query ``table_definitions`` every time.
+
+    Entries are invalidated explicitly by ``create_table``. When several processes share one database,
+    ``ttl`` (in seconds) bounds how long a definition changed by another process can be served stale.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[Dict[str, str], float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, table_name: str) -> Optional[Dict[str, str]]:
+        entry = self._entries.get(table_name)
+        if entry is not None:
+            columns, stored_at = entry
+            if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                self.hits += 1
+                return columns
+            del self._entries[table_name]
+        self.misses += 1
+        return None
+
+    def set(self, table_name: str, columns: Dict[str, str]):
+        self._entries[table_name] = (columns, time.monotonic())
+
+    def invalidate(self, table_name: str):
+        self._entries.pop(table_name, None)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "ttl": self.ttl,
+        }
+
+
+class QueryStats:
+    """
+    Per-statement latency histograms by operation and table, and a log of slow statements.
+
+    ``attach`` hooks the cursor events of an engine. Statements that take at least ``slow_query_ms``
+    are logged at WARNING and kept in ``slow_queries``, with their plan when ``explain`` is set.
+    Parameters are never recorded.
+    """
+
+    buckets_ms = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+    _table_pattern = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE|ON)\s+"?(\w+)"?', re.IGNORECASE)
+
+    def __init__(self, slow_query_ms: Optional[float] = None, explain: bool = False, max_slow_queries: int = 100):
+        self.slow_query_ms = slow_query_ms
+        self.explain = explain
+        self.slow_queries: deque = deque(maxlen=max_slow_queries)
+        self._histograms: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    @classmethod
+    def classify(cls, statement: str) -> Tuple[str, str]:
+        """The operation (first keyword) and the table a statement works on."""
+        words = statement.lstrip().split(None, 1)
+        match = cls._table_pattern.search(statement)
+        return (words[0].upper() if words else ""), (match.group(1) if match else "")
+
+    def record(self, operation: str, table: str, elapsed_ms: float):
+        histogram = self._histograms.get((operation, table))
+        if histogram is None:
+            histogram = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "buckets": [0] * (len(self.buckets_ms) + 1)}
+            self._histograms[(operation, table)] = histogram
+        histogram["count"] += 1
+        histogram["total_ms"] += elapsed_ms
+        histogram["max_ms"] = max(histogram["max_ms"], elapsed_ms)
+        histogram["buckets"][bisect.bisect_left(self.buckets_ms, elapsed_ms)] += 1
+
+    @staticmethod
+    def _explain(conn, statement: str, parameters) -> Optional[List[str]]:
+        # A raw DBAPI cursor, so the EXPLAIN is neither instrumented nor mixed with the statement's results
+        prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+        try:
+            cursor = conn.connection.cursor()
+            try:
+                cursor.execute(prefix + statement, parameters)
+                return [" ".join(str(value) for value in row) for row in cursor.fetchall()]
+            finally:
+                cursor.close()
+        except Exception as e:
+            logger.warning(f"Could not explain slow statement: {str(e)}")
+            return None
+
+    def attach(self, async_engine):
+        @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+        def _start_timer(conn, cursor, statement, parameters, context, executemany):
+            context._query_started = time.perf_counter()
+
+        @event.listens_for(async_engine.sync_engine, "after_cursor_execute")
+        def _record(conn, cursor, statement, parameters, context, executemany):
+            elapsed_ms = (time.perf_counter() - context._query_started) * 1000
+            operation, table = self.classify(statement)
+            self.record(operation, table, elapsed_ms)
+            if self.slow_query_ms is None or elapsed_ms < self.slow_query_ms:
+                return
+
+            plan = None
+            if self.explain and not executemany and operation in ("SELECT", "UPDATE", "DELETE"):
+                plan = self._explain(conn, statement, parameters)
+            logger.warning(
+                f"Slow {operation} on '{table}' took {elapsed_ms:.1f} ms: {statement}"
+                + (f"\nPlan: {plan}" if plan else "")
+            )
+            self.slow_queries.append(
+                {
+                    "operation": operation,
+                    "table": table,
+                    "ms": round(elapsed_ms, 3),
+                    "statement": statement,
+                    "plan": plan,
+                    "at": datetime.now(timezone.utc).isoformat(),
+                }
+            )
+
+    def snapshot(self) -> Dict[str, Any]:
+        bounds = [f"<={bound}" for bound in self.buckets_ms] + [f">{self.buckets_ms[-1]}"]
+        statements = [
+            {
+                "operation": operation,
+                "table": table,
+                "count": histogram["count"],
+                "total_ms": round(histogram["total_ms"], 3),
+                "avg_ms": round(histogram["total_ms"] / histogram["count"], 3),
+                "max_ms": round(histogram["max_ms"], 3),
+                "histogram_ms": dict(zip(bounds, histogram["buckets"])),
+            }
+            for (operation, table), histogram in self._histograms.items()
+        ]
+        statements.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        return {
+            "slow_query_ms": self.slow_query_ms,
+            "explain": self.explain,
+            "statements": statements,
+            "slow_queries": list(self.slow_queries),
+        }
+
+    def reset(self):
+        self._histograms.clear()
+        self.slow_queries.clear()
+
+
+class Database:
+    """
+    Engine, session factory and table caches for one database URL, all created on first use.
+
+    ``url`` defaults to ``HIVE_AGENT_DATABASE_URL`` and then to the embedded SQLite database. Use
+    ``get_database`` to share one instance, and so one connection pool, per URL.
+    """
+
+    def __init__(self, url: Optional[str] = None):
+        self.url = url or os.getenv("HIVE_AGENT_DATABASE_URL") or DEFAULT_DATABASE_URL
+        self._engine = None
+        self._session_factory = None
+        self.model_registry = ModelRegistry()
+        ttl = os.getenv("HIVE_AGENT_DB_DEFINITION_CACHE_TTL")
+        self.definition_cache = TableDefinitionCache(ttl=float(ttl) if ttl else None)
+        self.writer: Optional["BufferedWriter"] = None
+        self.retention: Optional["ChatRetention"] = None
+        # Called with a table name after its rows were updated, deleted or bulk imported, so caches of
+        # them (e.g. hive_agent.chat.history_cache) can be dropped
+        self.change_listeners: List[Callable[[str], None]] = []
+        self.query_stats = QueryStats(
+            slow_query_ms=_env_int("HIVE_AGENT_DB_SLOW_QUERY_MS", 500),
+            explain=_env_flag("HIVE_AGENT_DB_SLOW_QUERY_EXPLAIN", False),
+        )
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            if self.url.startswith("sqlite"):
+                path = make_url(self.url).database
+                if path and path != ":memory:" and os.path.dirname(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._engine = create_async_engine(self.url, echo=False, **engine_options(self.url))
+            if self.url.startswith("sqlite"):
+                configure_sqlite(self._engine, sqlite_pragmas())
+            if _env_flag("HIVE_AGENT_DB_QUERY_STATS", True):
+                self.query_stats.attach(self._engine)
+            logger.info(f"Database engine created for {make_url(self.url).render_as_string(hide_password=True)}")
+        return self._engine
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            self._session_factory = sessionmaker(self.engine, expire_on_commit=False, class_=AsyncSession)  # type: ignore
+        return self._session_factory
+
+    @property
+    def dialect(self) -> str:
+        return make_url(self.url).get_backend_name()
+
+    def notify_change(self, table_name: str):
+        for listener in self.change_listeners:
+            listener(table_name)
+
+    def session(self) -> AsyncSession:
+        return self.session_factory()
+
+    async def get_db(self):
+        async with self.session() as session:
+            try:
+                yield session
+            finally:
+                await session.close()
+
+    async def initialize(self):
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(_migrate_table_definitions)
+
+    async def dispose(self):
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+            self._session_factory = None
+
+
+_databases: Dict[str, Database] = {}
 
-    columns = {
-        "user_id": "String",
-        "session_id": "String",
-        "message": "String",
-        "role": "String",
-        "timestamp": "String",
-        "agent_id": "String",
-    }
 
-    await db_manager.create_table("chats", columns)
-    logger.info("Table 'chats' created successfully.")
+def get_database(url: Optional[str] = None) -> Database:
+    """Return the shared ``Database`` for ``url``, or for the default URL when it is not given."""
+    url = url or os.getenv("HIVE_AGENT_DATABASE_URL") or DEFAULT_DATABASE_URL
+    if url not in _databases:
+        _databases[url] = Database(url)
+    return _databases[url]
+
+
+def database_for_session(db: Optional[AsyncSession]) -> Database:
+    """Return the ``Database`` whose engine ``db`` is bound to, falling back to the default one."""
+    bind = getattr(db, "bind", None)
+    for database in _databases.values():
+        if database._engine is not None and database._engine is bind:
+            return database
+    return get_database()
+
+
+def __getattr__(name: str):
+    # Lazy aliases for code written against the former module-level engine
+    if name == "engine":
+        return get_database().engine
+    if name == "SessionLocal":
+        return get_database().session_factory
+    if name == "db_url":
+        return get_database().url
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _ChunkSink:
+    """Write-only file object that hands back what was written since the last ``drain``."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class CsvEncoder:
+    """CSV with a header row; JSON values are written as JSON text and NULL as an empty field."""
+
+    media_type = "text/csv"
+    extension = "csv"
+
+    def __init__(self, columns: Dict[str, str]):
+        self.columns = list(columns)
+        self._header = True
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if self._header:
+            writer.writerow(self.columns)
+            self._header = False
+        for row in rows:
+            writer.writerow([self._value(row[name]) for name in self.columns])
+        return buffer.getvalue().encode("utf-8")
+
+    @staticmethod
+    def _value(value: Any) -> Any:
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+    def close(self) -> bytes:
+        # An empty export still gets its header
+        return self.encode([]) if self._header else b""
+
+
+class NdjsonEncoder:
+    """One JSON object per line, the same format as ``/database/read-data-stream``."""
+
+    media_type = "application/x-ndjson"
+    extension = "ndjson"
+
+    def __init__(self, columns: Dict[str, str]):
+        self.columns = columns
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        return "".join(json.dumps(row, default=str) + "\n" for row in rows).encode("utf-8")
+
+    def close(self) -> bytes:
+        return b""
+
+
+class ParquetEncoder:
+    """
+    Parquet with one row group per batch, typed from the table definition; JSON columns are stored as JSON text.
+
+    Needs the optional ``pyarrow`` dependency (``pip install hive-agent[parquet]``).
+    """
+
+    media_type = "application/vnd.apache.parquet"
+    extension = "parquet"
+
+    def __init__(self, columns: Dict[str, str]):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet export needs pyarrow, install it with: pip install hive-agent[parquet]")
+
+        arrow_types = {
+            "String": pa.string(),
+            "Text": pa.string(),
+            "JSON": pa.string(),
+            "Integer": pa.int64(),
+            "Float": pa.float64(),
+            "Boolean": pa.bool_(),
+            "DateTime": pa.timestamp("us"),
+        }
+        self._pa = pa
+        self._json_columns = [name for name, column_type in columns.items() if column_type == "JSON"]
+        self._schema = pa.schema([(name, arrow_types[column_type]) for name, column_type in columns.items()])
+        self._sink = _ChunkSink()
+        self._writer = pq.ParquetWriter(self._sink, self._schema)
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        if self._json_columns:
+            rows = [
+                dict(row, **{name: None if row[name] is None else json.dumps(row[name]) for name in self._json_columns})
+                for row in rows
+            ]
+        self._writer.write_table(self._pa.Table.from_pylist(rows, schema=self._schema))
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
 
 
 class DatabaseManager:
     sqlalchemy_types = {
         "String": String,
         "Integer": Integer,
-        "JSON": JSON,
+        # JSONB on Postgres, so JSON columns support containment and GIN indexes
+        "JSON": JSON().with_variant(JSONB(), "postgresql"),
         "Float": Float,
         "DateTime": DateTime,
         "Boolean": Boolean,
         "Text": Text,
     }
 
-    def __init__(self, db: AsyncSession):
+    filter_operators = {
+        "eq": lambda column, value: column.is_(None) if value is None else column == value,
+        "ne": lambda column, value: column.is_not(None) if value is None else column != value,
+        "lt": lambda column, value: column < value,
+        "lte": lambda column, value: column <= value,
+        "gt": lambda column, value: column > value,
+        "gte": lambda column, value: column >= value,
+        "like": lambda column, value: column.like(value),
+        "ilike": lambda column, value: column.ilike(value),
+        "in": lambda column, value: column.in_(value),
+        "not_in": lambda column, value: column.not_in(value),
+        "between": lambda column, value: column.between(*value),
+    }
+
+    aggregate_functions = {
+        "count": func.count,
+        "sum": func.sum,
+        "avg": func.avg,
+        "min": func.min,
+        "max": func.max,
+    }
+
+    # Types a value at a JSON path can be compared as; numbers compare as Float
+    json_value_types = {"String": String, "Float": Float, "Boolean": Boolean}
+
+    index_methods = ("btree", "gin")
+
+    export_formats = {"csv": CsvEncoder, "ndjson": NdjsonEncoder, "parquet": ParquetEncoder}
+    import_formats = ("csv", "ndjson")
+
+    # Reads and inserts on hot paths reuse statements prebuilt per table (see _statement);
+    # turned off only to measure the difference
+    cache_statements = True
+    max_cached_statements = 128
+    # Operators a prebuilt statement can take the operand of as a bound parameter
+    bindable_operators = ("eq", "ne", "lt", "lte", "gt", "gte", "like", "ilike")
+
+    writer: Optional["BufferedWriter"] = None
+    _database: Optional[Database] = None
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        writer: Optional["BufferedWriter"] = None,
+        database: Optional[Database] = None,
+    ):
         self.db = db
+        self._database = database or database_for_session(db)
+        # Managers share their database's write-behind writer, so every read sees the rows queued on it
+        self.writer = writer if writer is not None else self.database.writer
+
+    @property
+    def database(self) -> Database:
+        return self._database if self._database is not None else get_database()
+
+    @property
+    def model_registry(self) -> ModelRegistry:
+        return self.database.model_registry
 
-    def _generate_model_class(self, table_name: str, columns: Dict[str, str]):
+    @property
+    def definition_cache(self) -> TableDefinitionCache:
+        return self.database.definition_cache
+
+    @staticmethod
+    def _index_name(table_name: str, index: Dict[str, Any]) -> str:
+        return index.get("name") or f"ix_{table_name}_{'_'.join(index['columns'])}".replace(".", "_")
+
+    @staticmethod
+    def _json_value_type(operand: Any) -> str:
+        sample = operand[0] if isinstance(operand, (list, tuple)) and operand else operand
+        if isinstance(sample, bool):
+            return "Boolean"
+        if isinstance(sample, (int, float)):
+            return "Float"
+        return "String"
+
+    def _json_path_expression(self, column, path: str, value_type: str = "String"):
+        """
+        The value of JSON ``column`` at ``path`` (dot separated keys, digits index arrays), as ``value_type``.
+
+        Compiles to ``json_extract`` on SQLite and ``->>``/``#>>`` on Postgres. The path is rendered inline
+        instead of as a bound parameter so that queries match expression indexes built from the same path.
+        """
+        keys = path.split(".")
+        if not all(re.fullmatch(r"[A-Za-z0-9_\-]+", key) for key in keys):
+            raise ValueError(f"Invalid JSON path: {path}")
+        sql_type = self.json_value_types.get(value_type)
+        if sql_type is None:
+            raise ValueError(f"Unsupported JSON value type: {value_type}")
+
+        if self.database.dialect == "postgresql":
+            if len(keys) == 1:
+                key = keys[0] if keys[0].isdigit() else f"'{keys[0]}'"
+                expression = column.op("->>", return_type=String)(literal_column(key))
+            else:
+                expression = column.op("#>>", return_type=String)(literal_column(f"'{{{','.join(keys)}}}'"))
+            return expression if value_type == "String" else cast(expression, sql_type)
+
+        json_path = "$" + "".join(f"[{key}]" if key.isdigit() else f'."{key}"' for key in keys)
+        return func.json_extract(column, literal_column(f"'{json_path}'"), type_=sql_type)
+
+    def _json_contains(self, column, value: Any, path: Optional[List[str]] = None):
+        """
+        Match rows whose JSON ``column`` contains the object ``value``.
+
+        Postgres uses ``@>``, which a GIN index on the column serves. Tables created before JSON
+        columns became JSONB still have ``json`` columns, which have no ``@>``, so the column is cast;
+        on a JSONB column the cast is a no-op and the index is still used. Elsewhere the object is
+        compiled into one comparison per scalar leaf, so it cannot contain arrays.
+        """
+        if not isinstance(value, dict):
+            raise ValueError("contains expects an object")
+        if self.database.dialect == "postgresql" and path is None:
+            return cast(column, JSONB).contains(value)
+
+        conditions = []
+        for key, item in value.items():
+            item_path = (path or []) + [str(key)]
+            if isinstance(item, dict):
+                conditions.append(self._json_contains(column, item, item_path))
+            elif isinstance(item, list):
+                raise ValueError(f"contains does not support arrays on {self.database.dialect}")
+            else:
+                expression = self._json_path_expression(column, ".".join(item_path), self._json_value_type(item))
+                conditions.append(expression.is_(None) if item is None else expression == item)
+        return and_(true(), *conditions)
+
+    def _build_table(
+        self, table_name: str, columns: Dict[str, str], indexes: Optional[List[Dict[str, Any]]] = None
+    ) -> Table:
         metadata = MetaData()
         columns_list: List[Column] = []
         for name, column_type in columns.items():
@@ -94,6 +880,55 @@ class DatabaseManager:
             columns_list.append(Column(name, column_type_class))
         columns_list.insert(0, Column("id", Integer, primary_key=True))
         table = Table(table_name, metadata, *columns_list)
+
+        for index in indexes or []:
+            index_columns = index.get("columns") or []
+            if not index_columns:
+                raise ValueError("Index must have at least one column")
+            json_types = index.get("json_types") or {}
+            elements = []
+            for name in index_columns:
+                column_name, _, path = name.partition(".")
+                if column_name not in table.c:
+                    raise ValueError(f"Unknown index column: {name}")
+                if not path:
+                    elements.append(table.c[column_name])
+                    continue
+                if not isinstance(table.c[column_name].type, JSON):
+                    raise ValueError(f"Index column {column_name} is not a JSON column")
+                elements.append(
+                    self._json_path_expression(table.c[column_name], path, json_types.get(name, "String"))
+                )
+            using = index.get("using")
+            if using is not None and using not in self.index_methods:
+                raise ValueError(f"Unsupported index method: {using}")
+            Index(
+                self._index_name(table_name, index),
+                *elements,
+                unique=bool(index.get("unique", False)),
+                **({"postgresql_using": using} if using else {}),
+            )
+        return table
+
+    @staticmethod
+    def _create_indexes(conn, indexes):
+        # IF NOT EXISTS instead of checkfirst, which cannot reflect expression indexes on SQLite
+        for index in indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+
+    @classmethod
+    def _create_table_and_indexes(cls, conn, table: Table):
+        # create_all skips the indexes of a table that already exists, so create them one by one
+        if inspect(conn).has_table(table.name):
+            cls._create_indexes(conn, table.indexes)
+        else:
+            table.metadata.create_all(conn)
+
+    def _generate_model_class(
+        self, table_name: str, columns: Dict[str, str], indexes: Optional[List[Dict[str, Any]]] = None
+    ):
+        table = self._build_table(table_name, columns, indexes)
+        metadata = table.metadata
         model = type(
             table_name.capitalize(),
             (Base,),
@@ -101,38 +936,110 @@ class DatabaseManager:
                 "__tablename__": table_name,
                 "__table__": table,
                 "__mapper_args__": {"eager_defaults": True},
+                # Prebuilt statements for this table, see _statement
+                "_statements": {},
             },
         )
         return model, metadata
 
-    async def create_table(self, table_name: str, columns: Dict[str, str]):
-        logger.info(f"Creating table '{table_name}' with columns: {columns}")
+    def _statement(self, model, key: Tuple, build: Callable[[], Any]):
+        """
+        Return the statement cached on ``model`` under ``key``, building it with ``build`` the first time.
+
+        Statements are built once per mapped class with ``bindparam`` placeholders for the values, so hot
+        paths skip constructing a new ``select``/``insert`` per call and reuse the compiled form from
+        SQLAlchemy's compiled cache. The registry hands out a new class when a definition changes, which
+        drops its statements with it.
+        """
+        if not self.cache_statements:
+            return build()
+        statements = model._statements
+        statement = statements.get(key)
+        if statement is None:
+            if len(statements) >= self.max_cached_statements:
+                statements.clear()
+            statement = statements[key] = build()
+        return statement
+
+    async def _get_model(
+        self, table_name: str, columns: Dict[str, str], indexes: Optional[List[Dict[str, Any]]] = None
+    ):
+        model = self.model_registry.get(table_name, columns)
+        if model is not None:
+            return model
+
+        model, _ = self._generate_model_class(table_name, columns, indexes)
+        async with self.database.engine.begin() as conn:
+            await conn.run_sync(self._create_table_and_indexes, model.__table__)
+        self.model_registry.register(table_name, columns, model)
+        return model
+
+    async def create_table(
+        self, table_name: str, columns: Dict[str, str], indexes: Optional[List[Dict[str, Any]]] = None
+    ):
+        logger.info(f"Creating table '{table_name}' with columns: {columns}, indexes: {indexes}")
         try:
             if not isinstance(columns, dict):
                 raise ValueError("Columns must be a dictionary")
+            # Fail on a bad column type or index before anything is saved
+            self._build_table(table_name, columns, indexes)
 
-            table_definition = TableDefinition(table_name=table_name, columns=columns)
+            table_definition = TableDefinition(table_name=table_name, columns=columns, indexes=indexes)
             self.db.add(table_definition)
             await self.db.commit()
             logger.info(f"Table definition for '{table_name}' saved.")
 
-            _, metadata = self._generate_model_class(table_name, columns)
-            async with engine.begin() as conn:
-                await conn.run_sync(metadata.create_all)
+            self.definition_cache.invalidate(table_name)
+            self.model_registry.invalidate(table_name)
+            await self._get_model(table_name, columns, indexes)
             logger.info(f"Table '{table_name}' created successfully.")
         except SQLAlchemyError as e:
             await self.db.rollback()
             logger.error(f"Error creating table '{table_name}': {str(e)}")
             raise ValueError(f"Error creating table: {str(e)}")
 
+    async def ensure_indexes(self, table_name: str, indexes: List[Dict[str, Any]]):
+        """
+        Add ``indexes`` to an existing table and record them in its definition.
+
+        Indexes that already exist, by name, are left alone, so this is safe to run on every startup.
+        """
+        logger.info(f"Ensuring indexes on '{table_name}': {indexes}")
+        try:
+            result = await self.db.execute(select(TableDefinition).filter_by(table_name=table_name))
+            table_definition = result.scalars().first()
+            if not table_definition:
+                raise ValueError(f"Table '{table_name}' does not exist.")
+
+            table = self._build_table(table_name, table_definition.columns, indexes)
+            async with self.database.engine.begin() as conn:
+                await conn.run_sync(self._create_indexes, table.indexes)
+
+            recorded = list(table_definition.indexes or [])
+            recorded_names = {self._index_name(table_name, index) for index in recorded}
+            missing = [index for index in indexes if self._index_name(table_name, index) not in recorded_names]
+            if missing:
+                table_definition.indexes = recorded + missing
+                await self.db.commit()
+            logger.info(f"Indexes on '{table_name}' are up to date.")
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(f"Error creating indexes on '{table_name}': {str(e)}")
+            raise ValueError(f"Error creating indexes: {str(e)}")
+
     async def get_table_definition(self, table_name: str):
+        columns = self.definition_cache.get(table_name)
+        if columns is not None:
+            return columns
+
         logger.info(f"Retrieving table definition for '{table_name}'")
         try:
-            async with SessionLocal() as session:
+            async with self.database.session() as session:
                 result = await session.execute(select(TableDefinition).filter_by(table_name=table_name))
                 table_definition = result.scalars().first()
                 if table_definition:
                     logger.info(f"Table definition for '{table_name}' retrieved successfully.")
+                    self.definition_cache.set(table_name, table_definition.columns)
                     return table_definition.columns
                 logger.warning(f"Table definition for '{table_name}' not found.")
                 return None
@@ -141,15 +1048,14 @@ class DatabaseManager:
             raise ValueError(f"Error retrieving table definition: {str(e)}")
 
     async def insert_data(self, table_name: str, data: Dict[str, Any]):
-        logger.info(f"Inserting data into '{table_name}': {data}")
+        logger.info(f"Inserting data into '{table_name}'")
+        logger.debug("Data for '%s': %s", table_name, data)
         try:
             columns = await self.get_table_definition(table_name)
             if not columns:
                 raise ValueError(f"Table '{table_name}' does not exist.")
 
-            model, metadata = self._generate_model_class(table_name, columns)
-            async with engine.begin() as conn:
-                await conn.run_sync(metadata.create_all)
+            model = await self._get_model(table_name, columns)
 
             instance = model(**data)
             self.db.add(instance)
@@ -162,47 +1068,791 @@ class DatabaseManager:
             logger.error(f"Error inserting data into '{table_name}': {str(e)}")
             raise ValueError(f"Error inserting data: {str(e)}")
 
-    async def read_data(self, table_name: str, filters: Optional[Dict[str, List[Any]]] = None):
-        logger.info(f"Reading data from '{table_name}' with filters: {filters}")
+    async def enqueue_insert(self, table_name: str, data: Dict[str, Any]):
+        """Insert ``data`` through the write-behind ``writer`` if there is one, otherwise right away."""
+        if self.writer is None:
+            await self.insert_many(table_name, [data])
+            return
+        self.writer.enqueue(table_name, data)
+
+    async def enqueue_insert_many(self, table_name: str, rows: List[Dict[str, Any]]):
+        """
+        Insert ``rows`` together: in one transaction right away, or queued back to back on the
+        write-behind ``writer`` so they are written in the same batch.
+        """
+        if self.writer is None:
+            await self.insert_many(table_name, rows)
+            return
+        self.writer.enqueue_many(table_name, rows)
+
+    async def insert_many(self, table_name: str, rows: List[Dict[str, Any]], chunk_size: int = 1000) -> List[int]:
+        logger.info(f"Inserting {len(rows)} rows into '{table_name}' in chunks of {chunk_size}")
         try:
+            if chunk_size < 1:
+                raise ValueError("chunk_size must be a positive integer")
+
             columns = await self.get_table_definition(table_name)
             if not columns:
                 raise ValueError(f"Table '{table_name}' does not exist.")
+            if not rows:
+                return []
+            for row in rows:
+                unknown = [name for name in row if name != "id" and name not in columns]
+                if unknown:
+                    raise ValueError(f"Unknown columns: {', '.join(unknown)}")
 
-            model, metadata = self._generate_model_class(table_name, columns)
-            async with engine.begin() as conn:
-                await conn.run_sync(metadata.create_all)
+            model = await self._get_model(table_name, columns)
 
-            query = select(model)
-            if filters:
-                for key, values in filters.items():
-                    if key == "details":
-                        for value in values:
-                            for sub_key, sub_value in value.items():
-                                query = query.where(getattr(model, key)[sub_key] == sub_value)
-                    else:
-                        query = query.filter(getattr(model, key).in_(values))
+            statement = self._statement(
+                model, ("insert",), lambda: insert(model).returning(model.id, sort_by_parameter_order=True)
+            )
+            ids: List[int] = []
+            for start in range(0, len(rows), chunk_size):
+                result = await self.db.scalars(statement, rows[start : start + chunk_size])
+                ids.extend(result.all())
+            await self.db.commit()
+            logger.info(f"{len(ids)} rows inserted into '{table_name}' successfully.")
+            return ids
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(f"Error inserting rows into '{table_name}': {str(e)}")
+            raise ValueError(f"Error inserting data: {str(e)}")
 
-            result = await self.db.execute(query)
-            instances = result.scalars().all()
-            data = [{column: getattr(instance, column) for column in columns.keys()} for instance in instances]
+    def _column_expression(self, model, key: str, value_type: str = "String"):
+        """The column named by ``key``, or the value at its JSON path as ``value_type``."""
+        column_name, _, path = key.partition(".")
+        if column_name not in model.__table__.c:
+            raise ValueError(f"Unknown column: {column_name}")
+        column = getattr(model, column_name)
+        if not path:
+            return column
+        if not isinstance(model.__table__.c[column_name].type, JSON):
+            raise ValueError(f"Column {column_name} is not a JSON column")
+        return self._json_path_expression(column, path, value_type)
+
+    def _filter_target(self, model, key: str, operand: Any):
+        return self._column_expression(model, key, self._json_value_type(operand))
+
+    def _is_json_column(self, model, key: str) -> bool:
+        return key in model.__table__.c and isinstance(model.__table__.c[key].type, JSON)
+
+    def _apply_filters(self, query, model, filters: Optional[Filters]):
+        if filters:
+            for key, values in filters.items():
+                if isinstance(values, dict):
+                    for operator, operand in values.items():
+                        if operator == "contains":
+                            if not self._is_json_column(model, key):
+                                raise ValueError(f"contains needs a JSON column, got {key}")
+                            query = query.where(self._json_contains(getattr(model, key), operand))
+                            continue
+                        compile_condition = self.filter_operators.get(operator)
+                        if compile_condition is None:
+                            raise ValueError(f"Unsupported filter operator: {operator}")
+                        if operator == "between" and (not isinstance(operand, list) or len(operand) != 2):
+                            raise ValueError("between expects a [low, high] pair")
+                        query = query.where(compile_condition(self._filter_target(model, key, operand), operand))
+                elif self._is_json_column(model, key) and values and all(isinstance(value, dict) for value in values):
+                    # A list of objects on a JSON column matches rows containing any of them
+                    column = getattr(model, key)
+                    query = query.where(or_(*[self._json_contains(column, value) for value in values]))
+                else:
+                    query = query.filter(self._filter_target(model, key, values).in_(values))
+        return query
+
+    @staticmethod
+    def _parse_fields(columns: Dict[str, str], fields: Optional[List[str]]) -> List[str]:
+        if not fields:
+            return list(columns.keys())
+        for name in fields:
+            if name != "id" and name not in columns:
+                raise ValueError(f"Unknown column: {name}")
+        return fields
+
+    @staticmethod
+    def _parse_order_by(columns: Dict[str, str], order_by: Optional[List[str]]) -> List[Tuple[str, bool]]:
+        parsed = []
+        for field in order_by or []:
+            descending = field.startswith("-")
+            name = field[1:] if descending else field
+            if name != "id" and name not in columns:
+                raise ValueError(f"Unknown order_by column: {name}")
+            if name != "id":
+                parsed.append((name, descending))
+        return parsed
+
+    @staticmethod
+    def encode_cursor(order_by: List[Tuple[str, bool]], values: List[Any], row_id: int) -> str:
+        payload = {
+            "order_by": [[name, descending] for name, descending in order_by],
+            "values": [value.isoformat() if isinstance(value, datetime) else value for value in values],
+            "id": row_id,
+        }
+        return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def decode_cursor(
+        cursor: str, columns: Dict[str, str], order_by: List[Tuple[str, bool]]
+    ) -> Tuple[List[Any], int]:
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            cursor_order_by = [(name, descending) for name, descending in payload["order_by"]]
+            values = payload["values"]
+            row_id = int(payload["id"])
+        except (ValueError, KeyError, TypeError):
+            raise ValueError("Invalid cursor")
+        if cursor_order_by != order_by or len(values) != len(order_by):
+            raise ValueError("Cursor does not match order_by")
+        values = [
+            datetime.fromisoformat(value) if value is not None and columns[name] == "DateTime" else value
+            for (name, _), value in zip(order_by, values)
+        ]
+        return values, row_id
+
+    def _build_read_query(
+        self,
+        model,
+        columns: Dict[str, str],
+        filters: Optional[Filters] = None,
+        order_by: Optional[List[str]] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ):
+        """
+        Build the Core SELECT for ``read_data``/``stream_data`` and the parameters to execute it with.
+
+        Only ``fields`` (all columns by default) are selected, plus ``id`` and the ``order_by`` columns
+        needed to build a cursor. Rows are ordered by ``order_by`` (``-column`` for descending, NULLs
+        last) with ``id`` as the tie-breaker, which makes the order total so ``cursor`` can resume
+        strictly after the last row of the previous page (keyset pagination) instead of using ``OFFSET``.
+        """
+        order = self._parse_order_by(columns, order_by)
+        selected = self._parse_fields(columns, fields)
+        names = dict.fromkeys(["id", *selected, *[name for name, _ in order]])
+        if not cursor:
+            prebuilt = self._prebuilt_read_query(model, filters, tuple(names), tuple(order))
+            if prebuilt is not None:
+                query, params = prebuilt
+                return query, order, selected, params
+
+        query = self._apply_filters(select(*[model.__table__.c[name] for name in names]), model, filters)
+
+        if cursor:
+            values, row_id = self.decode_cursor(cursor, columns, order)
+            # (c1, ..., cn, id) > (v1, ..., vn, last_id), expanded so each column can have its own direction
+            keys = [(getattr(model, name), descending, value) for (name, descending), value in zip(order, values)]
+            keys.append((model.id, False, row_id))
+            conditions = []
+            for position, (column, descending, value) in enumerate(keys):
+                if value is None:
+                    after = false()
+                else:
+                    after = or_(column < value if descending else column > value, column.is_(None))
+                equal_before = [c.is_(None) if v is None else c == v for c, _, v in keys[:position]]
+                conditions.append(and_(*equal_before, after))
+            query = query.where(or_(*conditions))
+
+        order_clauses = [
+            (getattr(model, name).desc() if descending else getattr(model, name).asc()).nulls_last()
+            for name, descending in order
+        ]
+        return query.order_by(*order_clauses, model.id.asc()), order, selected, {}
+
+    def _prebuilt_read_query(self, model, filters: Optional[Filters], names: Tuple[str, ...], order: Tuple):
+        """
+        Return a cached SELECT plus its parameters when every filter is a plain comparison on a column.
+
+        Lists become ``IN`` with an expanding bound parameter and operator filters compare against a
+        bound parameter, so the chat history lookups (``user_id``/``session_id`` lists with a timestamp
+        window) reuse one statement per shape. Anything else (JSON paths and containment, ``between``,
+        NULL comparisons) returns None and is built by ``_apply_filters`` as before.
+        """
+        table = model.__table__
+        shape = []
+        params = {}
+        for key, values in (filters or {}).items():
+            if key not in table.c or self._is_json_column(model, key):
+                return None
+            if isinstance(values, dict):
+                operators = tuple(values)
+                for operator, operand in values.items():
+                    if operator not in self.bindable_operators or operand is None or isinstance(operand, (list, dict)):
+                        return None
+                    params[f"filter_{key}_{operator}"] = operand
+                shape.append((key, operators))
+            else:
+                if not isinstance(values, list) or not values or any(isinstance(v, (list, dict)) for v in values):
+                    return None
+                params[f"filter_{key}"] = list(values)
+                shape.append((key, None))
+
+        def build():
+            query = select(*[table.c[name] for name in names])
+            for key, operators in shape:
+                column = table.c[key]
+                if operators is None:
+                    query = query.where(column.in_(bindparam(f"filter_{key}", expanding=True)))
+                    continue
+                for operator in operators:
+                    condition = self.filter_operators[operator](column, bindparam(f"filter_{key}_{operator}"))
+                    query = query.where(condition)
+            order_clauses = [
+                (table.c[name].desc() if descending else table.c[name].asc()).nulls_last()
+                for name, descending in order
+            ]
+            return query.order_by(*order_clauses, table.c.id.asc())
+
+        return self._statement(model, ("read", names, order, tuple(shape)), build), params
+
+    async def read_page(
+        self,
+        table_name: str,
+        filters: Optional[Filters] = None,
+        limit: Optional[int] = None,
+        order_by: Optional[List[str]] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        logger.info(
+            f"Reading data from '{table_name}' with filters: {filters}, fields: {fields}, "
+            f"limit: {limit}, order_by: {order_by}"
+        )
+        try:
+            if limit is not None and limit < 1:
+                raise ValueError("limit must be a positive integer")
+            if self.writer is not None:
+                # Read your own writes: rows still buffered for this table are written first
+                await self.writer.flush(table_name)
+
+            columns = await self.get_table_definition(table_name)
+            if not columns:
+                raise ValueError(f"Table '{table_name}' does not exist.")
+
+            model = await self._get_model(table_name, columns)
+
+            query, order, selected, params = self._build_read_query(
+                model, columns, filters, order_by, cursor, fields
+            )
+            if limit is not None:
+                # One extra row tells us whether there is a next page
+                query = query.limit(limit + 1)
+
+            result = await self.db.execute(query, params)
+            rows = result.mappings().all()
+
+            next_cursor = None
+            if limit is not None and len(rows) > limit:
+                rows = rows[:limit]
+                last = rows[-1]
+                next_cursor = self.encode_cursor(order, [last[name] for name, _ in order], last["id"])
+
+            data = [{column: row[column] for column in selected} for row in rows]
             logger.info(f"Data read from '{table_name}' successfully.")
+            return data, next_cursor
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(f"Error reading data from '{table_name}': {str(e)}")
+            raise ValueError(f"Error reading data: {str(e)}")
+
+    async def read_data(
+        self,
+        table_name: str,
+        filters: Optional[Filters] = None,
+        limit: Optional[int] = None,
+        order_by: Optional[List[str]] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        data, _ = await self.read_page(
+            table_name, filters, limit=limit, order_by=order_by, cursor=cursor, fields=fields
+        )
+        return data
+
+    async def validate_read(
+        self,
+        table_name: str,
+        filters: Optional[Filters] = None,
+        order_by: Optional[List[str]] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Dict[str, str]:
+        """
+        Build a read's query without running it, raising ValueError for a missing table or a bad
+        ``filters``, ``order_by`` or ``fields`` as the read would, and return the table definition.
+        Streaming routes call it before they send their headers.
+        """
+        columns = await self.get_table_definition(table_name)
+        if not columns:
+            raise ValueError(f"Table '{table_name}' does not exist.")
+        model = await self._get_model(table_name, columns)
+        self._build_read_query(model, columns, filters, order_by, fields=fields)
+        return columns
+
+    async def stream_data(
+        self,
+        table_name: str,
+        filters: Optional[Filters] = None,
+        order_by: Optional[List[str]] = None,
+        batch_size: int = 1000,
+        fields: Optional[List[str]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield matching rows one at a time from a server-side cursor, fetching ``batch_size`` rows per round trip."""
+        logger.info(f"Streaming data from '{table_name}' with filters: {filters}, order_by: {order_by}")
+        columns = await self.get_table_definition(table_name)
+        if not columns:
+            raise ValueError(f"Table '{table_name}' does not exist.")
+
+        model = await self._get_model(table_name, columns)
+
+        query, _, selected, params = self._build_read_query(model, columns, filters, order_by, fields=fields)
+        try:
+            result = await self.db.stream(query.execution_options(yield_per=batch_size), params)
+            async for row in result.mappings():
+                yield {column: row[column] for column in selected}
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(f"Error streaming data from '{table_name}': {str(e)}")
+            raise ValueError(f"Error reading data: {str(e)}")
+        logger.info(f"Data streamed from '{table_name}' successfully.")
+
+    def export_encoder(self, format: str, columns: Dict[str, str], fields: Optional[List[str]] = None):
+        """Return the encoder that writes ``fields`` (all columns by default) of a table as ``format``."""
+        encoder_class = self.export_formats.get(format)
+        if encoder_class is None:
+            raise ValueError(f"Unsupported export format: {format}, expected one of {', '.join(self.export_formats)}")
+        selected = self._parse_fields(columns, fields)
+        return encoder_class({name: "Integer" if name == "id" else columns[name] for name in selected})
+
+    async def export_data(
+        self,
+        table_name: str,
+        format: str = "ndjson",
+        filters: Optional[Filters] = None,
+        order_by: Optional[List[str]] = None,
+        fields: Optional[List[str]] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[bytes]:
+        """
+        Yield the matching rows encoded as ``format`` (see ``export_formats``), one chunk per ``batch_size`` rows.
+
+        Rows come from ``stream_data``, so memory stays bounded by the batch size whatever the table size.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+        columns = await self.get_table_definition(table_name)
+        if not columns:
+            raise ValueError(f"Table '{table_name}' does not exist.")
+        encoder = self.export_encoder(format, columns, fields)
+
+        logger.info(f"Exporting '{table_name}' as {format} with filters: {filters}")
+        batch = []
+        async for row in self.stream_data(table_name, filters, order_by, batch_size, fields):
+            batch.append(row)
+            if len(batch) == batch_size:
+                yield encoder.encode(batch)
+                batch = []
+        if batch:
+            yield encoder.encode(batch)
+        tail = encoder.close()
+        if tail:
+            yield tail
+
+    @staticmethod
+    async def _import_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+        """Split a stream of UTF-8 chunks into lines, keeping line endings."""
+        decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        pending = ""
+        async for chunk in chunks:
+            pending += decoder.decode(chunk)
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                yield line + "\n"
+        pending += decoder.decode(b"", final=True)
+        if pending:
+            yield pending
+
+    async def _import_records(
+        self, chunks: AsyncIterable[bytes], format: str, columns: Dict[str, str]
+    ) -> AsyncIterator[Tuple[int, Any]]:
+        """
+        Yield ``(line, row)`` for every record of a CSV or NDJSON stream, or ``(line, error)`` for one that can't be parsed.
+
+        CSV rows are string dicts keyed by the header row, which must only name columns of the table;
+        a quoted field may span several lines, so a record ends at the first newline after an even
+        number of quote characters.
+        """
+        line_number = 0
+        if format == "ndjson":
+            async for line in self._import_lines(chunks):
+                line_number += 1
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield line_number, ValueError(f"Invalid JSON: {e}")
+                    continue
+                yield line_number, row if isinstance(row, dict) else ValueError("Expected a JSON object")
+            return
+
+        header = None
+        record: List[str] = []
+        quotes = 0
+        async for line in self._import_lines(chunks):
+            line_number += 1
+            record.append(line)
+            quotes += line.count('"')
+            if quotes % 2:
+                continue
+            first_line = line_number - len(record) + 1
+            text, record, quotes = "".join(record), [], 0
+            if not text.strip():
+                continue
+            try:
+                values = next(csv.reader([text]))
+            except csv.Error as e:
+                yield first_line, ValueError(f"Invalid CSV: {e}")
+                continue
+            if header is None:
+                unknown = [name for name in values if name != "id" and name not in columns]
+                if unknown:
+                    raise ValueError(f"Unknown columns in CSV header: {', '.join(unknown)}")
+                header = values
+            elif len(values) != len(header):
+                yield first_line, ValueError(f"Expected {len(header)} fields, got {len(values)}")
+            else:
+                yield first_line, dict(zip(header, values))
+        if record:
+            yield line_number - len(record) + 1, ValueError("Unterminated quoted field")
+
+    @staticmethod
+    def _coerce_import_value(column_type: str, value: Any, from_text: bool) -> Any:
+        if from_text:
+            # CSV has no NULL, an empty field is one
+            if value == "":
+                return None
+            if column_type == "Integer":
+                return int(value)
+            if column_type == "Float":
+                return float(value)
+            if column_type == "Boolean":
+                flag = value.strip().lower()
+                if flag not in ("true", "false", "1", "0"):
+                    raise ValueError(f"not a boolean: {value!r}")
+                return flag in ("true", "1")
+            if column_type == "JSON":
+                return json.loads(value)
+        if value is None or column_type == "JSON":
+            return value
+        if column_type == "DateTime":
+            if not isinstance(value, str):
+                raise ValueError(f"expected an ISO 8601 string, got {value!r}")
+            timestamp = datetime.fromisoformat(value)
+            return naive_utc(timestamp) if timestamp.tzinfo else timestamp
+        expected = {"Integer": int, "Float": (int, float), "Boolean": bool}.get(column_type, str)
+        if not isinstance(value, expected) or (isinstance(value, bool) and column_type != "Boolean"):
+            raise ValueError(f"expected {column_type}, got {value!r}")
+        return float(value) if column_type == "Float" else value
+
+    def _coerce_import_row(self, columns: Dict[str, str], row: Dict[str, Any], from_text: bool) -> Dict[str, Any]:
+        """Validate ``row`` against the table definition and convert its values to the column types."""
+        unknown = [name for name in row if name != "id" and name not in columns]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        coerced = {}
+        for name, value in row.items():
+            try:
+                coerced[name] = self._coerce_import_value(columns.get(name, "Integer"), value, from_text)
+            except ValueError as e:
+                raise ValueError(f"Invalid value for '{name}': {e}")
+        return coerced
+
+    async def _write_import_batch(self, model, columns: Dict[str, str], rows: List[Dict[str, Any]]):
+        # executemany and COPY both need one column list, so rows are grouped by the columns they set
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(tuple(row), []).append(row)
+
+        engine = self.database.engine
+        if engine.dialect.name == "postgresql" and engine.dialect.driver == "asyncpg":
+            connection = await self.db.connection()
+            raw_connection = await connection.get_raw_connection()
+            for keys, group in groups.items():
+                # COPY sends JSONB as text
+                records = [
+                    tuple(
+                        json.dumps(row[key]) if columns.get(key) == "JSON" and row[key] is not None else row[key]
+                        for key in keys
+                    )
+                    for row in group
+                ]
+                await raw_connection.driver_connection.copy_records_to_table(
+                    model.__tablename__, records=records, columns=list(keys)
+                )
+        else:
+            statement = self._statement(model, ("import",), lambda: insert(model.__table__))
+            for group in groups.values():
+                await self.db.execute(statement, group)
+        await self.db.commit()
+
+    async def import_data(
+        self,
+        table_name: str,
+        chunks: AsyncIterable[bytes],
+        format: str = "csv",
+        batch_size: int = 5000,
+        max_errors: int = 100,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Parse a CSV or NDJSON byte stream and insert its rows into ``table_name`` in batches of ``batch_size``.
+
+        Rows are validated against the table definition; rows that don't parse or don't match it are
+        skipped and counted as rejected, and the first ``max_errors`` of them are reported with their line
+        number. Each batch is written with ``COPY`` on asyncpg and one executemany elsewhere, committed,
+        and followed by a progress event with the running totals. The last event has ``done`` set and
+        lists the rejected rows. A failing batch write raises ``ValueError``; earlier batches stay committed.
+        """
+        if format not in self.import_formats:
+            raise ValueError(f"Unsupported import format: {format}, expected one of {', '.join(self.import_formats)}")
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+        columns = await self.get_table_definition(table_name)
+        if not columns:
+            raise ValueError(f"Table '{table_name}' does not exist.")
+        model = await self._get_model(table_name, columns)
+
+        logger.info(f"Importing {format} into '{table_name}' in batches of {batch_size}")
+        progress = {"rows": 0, "inserted": 0, "rejected": 0, "done": False}
+        errors = []
+        batch = []
+
+        async def write_batch():
+            try:
+                await self._write_import_batch(model, columns, batch)
+            except Exception as e:
+                await self.db.rollback()
+                logger.error(f"Error importing data into '{table_name}': {str(e)}")
+                raise ValueError(f"Error importing data after {progress['inserted']} rows: {str(e)}")
+            progress["inserted"] += len(batch)
+            batch.clear()
+            self.database.notify_change(table_name)
+            logger.info(f"Import into '{table_name}': {progress}")
+
+        async for line, row in self._import_records(chunks, format, columns):
+            progress["rows"] += 1
+            if not isinstance(row, Exception):
+                try:
+                    batch.append(self._coerce_import_row(columns, row, from_text=format == "csv"))
+                except ValueError as e:
+                    row = e
+            if isinstance(row, Exception):
+                progress["rejected"] += 1
+                if len(errors) < max_errors:
+                    errors.append({"line": line, "error": str(row)})
+            if len(batch) == batch_size:
+                await write_batch()
+                yield dict(progress)
+        if batch:
+            await write_batch()
+            yield dict(progress)
+
+        logger.info(f"Import into '{table_name}' finished: {progress}")
+        yield dict(progress, done=True, errors=errors)
+
+    async def aggregate(
+        self,
+        table_name: str,
+        aggregates: Dict[str, Dict[str, Any]],
+        filters: Optional[Filters] = None,
+        group_by: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Compute ``aggregates`` in the database over the rows matching ``filters``, one row per group.
+
+        ``aggregates`` maps result names to ``{"function": ..., "column": ...}`` with a function from
+        ``aggregate_functions``; ``count`` without a column counts rows. Columns may be JSON paths,
+        aggregated as ``json_type`` (``Float`` by default). Groups are ordered by ``group_by``.
+        """
+        logger.info(
+            f"Aggregating '{table_name}' with aggregates: {aggregates}, filters: {filters}, group_by: {group_by}"
+        )
+        try:
+            if not aggregates:
+                raise ValueError("At least one aggregate is required")
+            if self.writer is not None:
+                await self.writer.flush(table_name)
+
+            columns = await self.get_table_definition(table_name)
+            if not columns:
+                raise ValueError(f"Table '{table_name}' does not exist.")
+
+            model = await self._get_model(table_name, columns)
+
+            groups = [self._column_expression(model, name) for name in group_by or []]
+            selected = [group.label(name) for group, name in zip(groups, group_by or [])]
+            for name, spec in aggregates.items():
+                if name in (group_by or []):
+                    raise ValueError(f"Aggregate {name} has the same name as a group_by column")
+                function_name = spec.get("function")
+                function = self.aggregate_functions.get(function_name)
+                if function is None:
+                    raise ValueError(f"Unsupported aggregate function: {function_name}")
+                if spec.get("column") is None:
+                    if function_name != "count":
+                        raise ValueError(f"{function_name} needs a column")
+                    selected.append(func.count().label(name))
+                else:
+                    column = self._column_expression(model, spec["column"], spec.get("json_type") or "Float")
+                    selected.append(function(column).label(name))
+
+            query = self._apply_filters(select(*selected).select_from(model.__table__), model, filters)
+            if groups:
+                query = query.group_by(*groups).order_by(*groups)
+
+            result = await self.db.execute(query)
+            data = [dict(row) for row in result.mappings().all()]
+            logger.info(f"Aggregated '{table_name}' into {len(data)} rows successfully.")
+            return data
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(f"Error aggregating '{table_name}': {str(e)}")
+            raise ValueError(f"Error aggregating data: {str(e)}")
+
+    async def read_latest_per_group(
+        self,
+        table_name: str,
+        group_by: str,
+        limit: int,
+        filters: Optional[Filters] = None,
+        order_column: str = "timestamp",
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        The newest ``limit`` rows by ``order_column`` (then ``id``) of every ``group_by`` value matching
+        ``filters``, picked in the database with ``row_number()`` and returned oldest first.
+        """
+        logger.info(f"Reading the latest {limit} rows per {group_by} from '{table_name}' with filters: {filters}")
+        try:
+            if limit < 1:
+                raise ValueError("limit must be a positive integer")
+            if self.writer is not None:
+                await self.writer.flush(table_name)
+
+            columns = await self.get_table_definition(table_name)
+            if not columns:
+                raise ValueError(f"Table '{table_name}' does not exist.")
+            for name in (group_by, order_column):
+                if name not in columns:
+                    raise ValueError(f"Unknown column: {name}")
+
+            model = await self._get_model(table_name, columns)
+
+            selected = self._parse_fields(columns, fields)
+            names = list(dict.fromkeys(["id", *selected, group_by, order_column]))
+            rank = func.row_number().over(
+                partition_by=getattr(model, group_by),
+                order_by=(getattr(model, order_column).desc(), model.id.desc()),
+            )
+            ranked = self._apply_filters(
+                select(*[model.__table__.c[name] for name in names], rank.label("row_rank")), model, filters
+            ).subquery("ranked")
+            query = (
+                select(*[ranked.c[name] for name in names])
+                .where(ranked.c.row_rank <= limit)
+                .order_by(ranked.c[order_column].asc(), ranked.c.id.asc())
+            )
+
+            result = await self.db.execute(query)
+            data = [{name: row[name] for name in selected} for row in result.mappings().all()]
+            logger.info(f"Read {len(data)} rows from '{table_name}' successfully.")
             return data
         except SQLAlchemyError as e:
             await self.db.rollback()
             logger.error(f"Error reading data from '{table_name}': {str(e)}")
             raise ValueError(f"Error reading data: {str(e)}")
 
+    async def read_chat_sessions(
+        self,
+        filters: Optional[Filters] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        preview_length: int = 200,
+        table_name: str = "chats",
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One row per chat session matching ``filters``, most recently active first, with its
+        ``message_count``, ``first_timestamp``, ``last_timestamp`` and the first ``preview_length``
+        characters of its last message. Sessions are grouped in the database and paged like
+        ``read_page``: pass the returned cursor back as ``cursor`` for the next ``limit`` sessions.
+        """
+        logger.info(f"Reading chat sessions from '{table_name}' with filters: {filters}, limit: {limit}")
+        try:
+            if limit is not None and limit < 1:
+                raise ValueError("limit must be a positive integer")
+            if self.writer is not None:
+                await self.writer.flush(table_name)
+
+            columns = await self.get_table_definition(table_name)
+            if not columns:
+                raise ValueError(f"Table '{table_name}' does not exist.")
+
+            model = await self._get_model(table_name, columns)
+
+            sessions = self._apply_filters(
+                select(
+                    model.session_id,
+                    func.count().label("message_count"),
+                    func.min(model.timestamp).label("first_timestamp"),
+                    func.max(model.timestamp).label("last_timestamp"),
+                    func.max(model.id).label("last_id"),
+                ),
+                model,
+                filters,
+            ).group_by(model.session_id).subquery("sessions")
+            last_message = model.__table__.alias("last_message")
+
+            # Keyset pagination on (last_timestamp, last_id) descending; last_id is unique per session
+            order = [("last_timestamp", True)]
+            query = select(
+                sessions,
+                last_message.c.role.label("last_role"),
+                func.substr(last_message.c.message, 1, preview_length).label("last_message"),
+            ).join(last_message, last_message.c.id == sessions.c.last_id)
+            if cursor:
+                (last_timestamp,), last_id = self.decode_cursor(cursor, {"last_timestamp": "DateTime"}, order)
+                query = query.where(
+                    or_(
+                        sessions.c.last_timestamp < last_timestamp,
+                        and_(sessions.c.last_timestamp == last_timestamp, sessions.c.last_id < last_id),
+                    )
+                )
+            query = query.order_by(sessions.c.last_timestamp.desc(), sessions.c.last_id.desc())
+            if limit is not None:
+                query = query.limit(limit + 1)
+
+            result = await self.db.execute(query)
+            data = [dict(row) for row in result.mappings().all()]
+            next_cursor = None
+            if limit is not None and len(data) > limit:
+                data = data[:limit]
+                next_cursor = self.encode_cursor(order, [data[-1]["last_timestamp"]], data[-1]["last_id"])
+            for row in data:
+                del row["last_id"]
+            logger.info(f"Read {len(data)} chat sessions from '{table_name}' successfully.")
+            return data, next_cursor
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(f"Error reading chat sessions from '{table_name}': {str(e)}")
+            raise ValueError(f"Error reading chat sessions: {str(e)}")
+
     async def update_data(self, table_name: str, row_id: int, new_data: Dict[str, Any]):
-        logger.info(f"Updating data in '{table_name}' for id {row_id} with new data: {new_data}")
+        logger.info(f"Updating data in '{table_name}' for id {row_id}")
+        logger.debug("New data for '%s': %s", table_name, new_data)
         try:
             columns = await self.get_table_definition(table_name)
             if not columns:
                 raise ValueError(f"Table '{table_name}' does not exist.")
 
-            model, metadata = self._generate_model_class(table_name, columns)
-            async with engine.begin() as conn:
-                await conn.run_sync(metadata.create_all)
+            model = await self._get_model(table_name, columns)
 
             instance = await self.db.get(model, row_id)
             if instance:
@@ -210,6 +1860,7 @@ class DatabaseManager:
                     setattr(instance, key, value)
                 await self.db.commit()
                 await self.db.refresh(instance)
+                self.database.notify_change(table_name)
                 logger.info(f"Data in '{table_name}' for id {row_id} updated successfully.")
             else:
                 logger.warning(f"No data found with id {row_id} in '{table_name}'.")
@@ -219,6 +1870,58 @@ class DatabaseManager:
             logger.error(f"Error updating data in '{table_name}' for id {row_id}: {str(e)}")
             raise ValueError(f"Error updating data: {str(e)}")
 
+    async def update_where(self, table_name: str, filters: Filters, new_data: Dict[str, Any]) -> int:
+        logger.info(f"Updating data in '{table_name}' with filters: {filters}")
+        logger.debug("New data for '%s': %s", table_name, new_data)
+        try:
+            if not filters:
+                raise ValueError("Filters are required to update by filter.")
+            if not new_data:
+                raise ValueError("No data to update.")
+
+            columns = await self.get_table_definition(table_name)
+            if not columns:
+                raise ValueError(f"Table '{table_name}' does not exist.")
+            for key in new_data:
+                if key not in columns:
+                    raise ValueError(f"Unknown column: {key}")
+
+            model = await self._get_model(table_name, columns)
+
+            statement = self._apply_filters(update(model.__table__), model, filters).values(**new_data)
+            result = await self.db.execute(statement)
+            await self.db.commit()
+            self.database.notify_change(table_name)
+            logger.info(f"{result.rowcount} rows in '{table_name}' updated successfully.")
+            return result.rowcount
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(f"Error updating data in '{table_name}' with filters {filters}: {str(e)}")
+            raise ValueError(f"Error updating data: {str(e)}")
+
+    async def delete_where(self, table_name: str, filters: Filters) -> int:
+        logger.info(f"Deleting data from '{table_name}' with filters: {filters}")
+        try:
+            if not filters:
+                raise ValueError("Filters are required to delete by filter.")
+
+            columns = await self.get_table_definition(table_name)
+            if not columns:
+                raise ValueError(f"Table '{table_name}' does not exist.")
+
+            model = await self._get_model(table_name, columns)
+
+            statement = self._apply_filters(delete(model.__table__), model, filters)
+            result = await self.db.execute(statement)
+            await self.db.commit()
+            self.database.notify_change(table_name)
+            logger.info(f"{result.rowcount} rows deleted from '{table_name}' successfully.")
+            return result.rowcount
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(f"Error deleting data from '{table_name}' with filters {filters}: {str(e)}")
+            raise ValueError(f"Error deleting data: {str(e)}")
+
     async def delete_data(self, table_name: str, row_id: int):
         logger.info(f"Deleting data from '{table_name}' for id {row_id}")
         try:
@@ -226,14 +1929,13 @@ class DatabaseManager:
             if not columns:
                 raise ValueError(f"Table '{table_name}' does not exist.")
 
-            model, metadata = self._generate_model_class(table_name, columns)
-            async with engine.begin() as conn:
-                await conn.run_sync(metadata.create_all)
+            model = await self._get_model(table_name, columns)
 
             instance = await self.db.get(model, row_id)
             if instance:
                 await self.db.delete(instance)
                 await self.db.commit()
+                self.database.notify_change(table_name)
                 logger.info(f"Data deleted from '{table_name}' for id {row_id} successfully.")
             else:
                 logger.warning(f"No data found with id {row_id} in '{table_name}'.")
@@ -242,3 +1944,410 @@ class DatabaseManager:
             await self.db.rollback()
             logger.error(f"Error deleting data from '{table_name}' for id {row_id}: {str(e)}")
             raise ValueError(f"Error deleting data: {str(e)}")
+
+
+class ScopedDatabaseManager:
+    """
+    ``DatabaseManager`` that runs every operation in a session of its own.
+
+    A ``DatabaseManager`` is bound to one ``AsyncSession``, which must not be used by concurrent
+    tasks. This one only holds the ``Database``, so a single instance can be shared, e.g. as the
+    ``db_manager`` utility, by any number of concurrent chats. Sessions come from the connection
+    pool and are closed as soon as the operation returns.
+    """
+
+    def __init__(self, database: Optional[Database] = None, writer: Optional["BufferedWriter"] = None):
+        self.database = database or get_database()
+        self.writer = writer
+
+    @property
+    def model_registry(self) -> ModelRegistry:
+        return self.database.model_registry
+
+    @property
+    def definition_cache(self) -> TableDefinitionCache:
+        return self.database.definition_cache
+
+    @asynccontextmanager
+    async def manager(self) -> AsyncIterator[DatabaseManager]:
+        """Yield a ``DatabaseManager`` on a new session, for several operations in one session."""
+        async with self.database.session() as session:
+            yield DatabaseManager(session, writer=self.writer, database=self.database)
+
+    async def stream_data(self, *args, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        async with self.manager() as db_manager:
+            async for row in db_manager.stream_data(*args, **kwargs):
+                yield row
+
+    async def export_data(self, *args, **kwargs) -> AsyncIterator[bytes]:
+        async with self.manager() as db_manager:
+            async for chunk in db_manager.export_data(*args, **kwargs):
+                yield chunk
+
+    async def import_data(self, *args, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        async with self.manager() as db_manager:
+            async for progress in db_manager.import_data(*args, **kwargs):
+                yield progress
+
+    def __getattr__(self, name: str):
+        attribute = getattr(DatabaseManager, name)
+        if isasyncgenfunction(attribute):
+            # Streams keep their session open while they are consumed, so each has a wrapper above
+            raise AttributeError(f"{type(self).__name__} has no streaming wrapper for {name}, use manager()")
+        if not asyncio.iscoroutinefunction(attribute):
+            if callable(attribute):
+                # Synchronous helpers don't touch the session
+                return getattr(DatabaseManager(None, writer=self.writer, database=self.database), name)
+            return attribute
+
+        @functools.wraps(attribute)
+        async def operation(*args, **kwargs):
+            async with self.manager() as db_manager:
+                return await getattr(db_manager, name)(*args, **kwargs)
+
+        return operation
+
+
+class BufferedWriter:
+    """
+    Write-behind queue that coalesces inserts from concurrent requests into batched transactions.
+
+    ``enqueue`` returns immediately; a background task writes the queued rows with ``insert_many``
+    every ``flush_interval_ms`` milliseconds, or as soon as ``max_batch_size`` rows are waiting.
+    Call ``close`` on shutdown so nothing queued is lost.
+    """
+
+    def __init__(self, flush_interval_ms: int = 50, max_batch_size: int = 500, database: Optional[Database] = None):
+        if flush_interval_ms <= 0 or max_batch_size < 1:
+            raise ValueError("flush_interval_ms and max_batch_size must be positive")
+        self.database = database
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._pending: List[Tuple[str, Dict[str, Any], asyncio.Future]] = []
+        # Rows queued by enqueue_many that must go in the same batch as the row after them
+        self._joined: Set[asyncio.Future] = set()
+        self._in_flight = 0
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._writing: Optional[asyncio.Task] = None
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        self.batches = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending) + self._in_flight
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "flushed_rows": self.flushed_rows,
+            "failed_rows": self.failed_rows,
+            "batches": self.batches,
+        }
+
+    def enqueue(self, table_name: str, data: Dict[str, Any]) -> asyncio.Future:
+        """Queue a row for insertion. The returned future resolves to the row id once it is written."""
+        future = asyncio.get_running_loop().create_future()
+        # Failures are logged by the writer, so an unawaited future must not warn again
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._pending.append((table_name, data, future))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        if len(self._pending) == 1 or len(self._pending) >= self.max_batch_size:
+            self._wakeup.set()
+        return future
+
+    def enqueue_many(self, table_name: str, rows: List[Dict[str, Any]]) -> List[asyncio.Future]:
+        """Queue rows that must be written in the same transaction; a flush never splits them."""
+        futures = [self.enqueue(table_name, data) for data in rows]
+        self._joined.update(futures[:-1])
+        return futures
+
+    async def _run(self):
+        while not self._closing:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                if self._closing:
+                    return
+            self._wakeup.clear()
+            if len(self._pending) < self.max_batch_size and not self._closing:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            await self.flush()
+
+    async def flush(self, table_name: Optional[str] = None):
+        """
+        Write everything queued so far. With ``table_name``, return right away unless rows for that
+        table are queued or a batch is being written.
+        """
+        if (
+            table_name is not None
+            and not self._flush_lock.locked()
+            and not any(pending[0] == table_name for pending in self._pending)
+        ):
+            return
+        async with self._flush_lock:
+            while self._pending:
+                end = min(self.max_batch_size, len(self._pending))
+                while end < len(self._pending) and self._pending[end - 1][2] in self._joined:
+                    end += 1
+                batch = self._pending[:end]
+                del self._pending[:end]
+                self._joined.difference_update(future for _, _, future in batch)
+                # The batch has left the queue, so a cancelled flush must not abandon it half way
+                self._writing = asyncio.ensure_future(self._write(batch))
+                await asyncio.shield(self._writing)
+
+    async def _write(self, batch: List[Tuple[str, Dict[str, Any], asyncio.Future]]):
+        self._in_flight = len(batch)
+        by_table: Dict[str, List[Tuple[Dict[str, Any], asyncio.Future]]] = {}
+        for table_name, data, future in batch:
+            by_table.setdefault(table_name, []).append((data, future))
+
+        try:
+            database = self.database or get_database()
+            async with database.session() as session:
+                db_manager = DatabaseManager(session, database=database)
+                for table_name, items in by_table.items():
+                    try:
+                        ids = await db_manager.insert_many(table_name, [data for data, _ in items])
+                    except Exception as e:
+                        logger.error(f"Error writing {len(items)} buffered rows to '{table_name}': {str(e)}")
+                        self.failed_rows += len(items)
+                        for _, future in items:
+                            if not future.done():
+                                future.set_exception(e)
+                        continue
+                    for (_, future), row_id in zip(items, ids):
+                        if not future.done():
+                            future.set_result(row_id)
+                    self.flushed_rows += len(items)
+            self.batches += 1
+        except Exception as e:
+            logger.error(f"Error writing a batch of {len(batch)} buffered rows: {str(e)}")
+            for _, _, future in batch:
+                if not future.done():
+                    self.failed_rows += 1
+                    future.set_exception(e)
+        finally:
+            self._in_flight = 0
+
+    async def close(self):
+        """Stop the background task, letting a batch being written finish, and write whatever is still queued."""
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._closing = False
+                self._task = None
+        if self._writing is not None and not self._writing.done():
+            await self._writing
+        await self.flush()
+
+
+def get_buffered_writer(database: Optional[Database] = None) -> Optional[BufferedWriter]:
+    """
+    Return the write-behind writer of ``database`` when ``HIVE_AGENT_DB_WRITE_BEHIND`` is enabled.
+
+    ``HIVE_AGENT_DB_WRITE_BEHIND_INTERVAL_MS`` and ``HIVE_AGENT_DB_WRITE_BEHIND_BATCH_SIZE`` set how
+    often and after how many rows it flushes.
+    """
+    database = database or get_database()
+    if database.writer is None and _env_flag("HIVE_AGENT_DB_WRITE_BEHIND", False):
+        database.writer = BufferedWriter(
+            flush_interval_ms=_env_int("HIVE_AGENT_DB_WRITE_BEHIND_INTERVAL_MS", 50),
+            max_batch_size=_env_int("HIVE_AGENT_DB_WRITE_BEHIND_BATCH_SIZE", 500),
+            database=database,
+        )
+    return database.writer
+
+
+async def close_buffered_writer(database: Optional[Database] = None):
+    database = database or get_database()
+    if database.writer is not None:
+        writer, database.writer = database.writer, None
+        await writer.close()
+        logger.info(f"Write-behind queue flushed: {writer.stats()}")
+
+
+class ChatRetention:
+    """
+    Background job that prunes the ``chats`` table by age and by message count per session.
+
+    Every ``interval_seconds`` a pass deletes messages older than ``max_age_days`` and, in each session
+    (user, session and agent) with more than ``max_messages_per_session`` messages, the oldest
+    ones beyond that. Rows are deleted ``batch_size`` at a time, each batch in its own short
+    transaction, so writers are never locked out for long. Either limit may be None to disable it.
+    """
+
+    # Columns identifying one conversation; those missing from the table are ignored
+    session_columns = ("user_id", "session_id", "agent_id", "swarm_id")
+
+    def __init__(
+        self,
+        max_age_days: Optional[float] = None,
+        max_messages_per_session: Optional[int] = None,
+        interval_seconds: float = 3600,
+        batch_size: int = 1000,
+        database: Optional[Database] = None,
+        table_name: str = "chats",
+    ):
+        if max_age_days is None and max_messages_per_session is None:
+            raise ValueError("Set max_age_days, max_messages_per_session or both")
+        if (max_age_days is not None and max_age_days <= 0) or (
+            max_messages_per_session is not None and max_messages_per_session < 1
+        ):
+            raise ValueError("max_age_days and max_messages_per_session must be positive")
+        if interval_seconds <= 0 or batch_size < 1:
+            raise ValueError("interval_seconds and batch_size must be positive")
+        self.database = database
+        self.table_name = table_name
+        self.max_age_days = max_age_days
+        self.max_messages_per_session = max_messages_per_session
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self.passes = 0
+        self.pruned_rows = 0
+        self.last_pass: Optional[Dict[str, Any]] = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_age_days": self.max_age_days,
+            "max_messages_per_session": self.max_messages_per_session,
+            "interval_seconds": self.interval_seconds,
+            "passes": self.passes,
+            "pruned_rows": self.pruned_rows,
+            "last_pass": self.last_pass,
+        }
+
+    async def _table(self, database: Database) -> Optional[Table]:
+        async with database.session() as session:
+            db_manager = DatabaseManager(session, database=database)
+            columns = await db_manager.get_table_definition(self.table_name)
+            if not columns:
+                return None
+            return (await db_manager._get_model(self.table_name, columns)).__table__
+
+    async def _delete_batches(
+        self, database: Database, table: Table, condition, order, limit: Optional[int] = None
+    ) -> int:
+        """Delete up to ``limit`` (all by default) rows matching ``condition``, oldest first, one batch per transaction."""
+        deleted = 0
+        while limit is None or deleted < limit:
+            size = self.batch_size if limit is None else min(self.batch_size, limit - deleted)
+            async with database.session() as session:
+                ids = (await session.scalars(select(table.c.id).where(condition).order_by(*order).limit(size))).all()
+                if not ids:
+                    break
+                await session.execute(delete(table).where(table.c.id.in_(ids)))
+                await session.commit()
+            database.notify_change(self.table_name)
+            deleted += len(ids)
+            if len(ids) < size:
+                break
+            # Let queued writes in between batches
+            await asyncio.sleep(0)
+        return deleted
+
+    async def prune(self) -> Dict[str, Any]:
+        """Run one pass now and return what it deleted and how long it took."""
+        database = self.database or get_database()
+        started = time.perf_counter()
+        by_age = by_count = 0
+        table = await self._table(database)
+        if table is not None:
+            oldest_first = [table.c.timestamp.asc().nulls_first(), table.c.id.asc()]
+            if self.max_age_days is not None:
+                cutoff = naive_utc(datetime.now(timezone.utc)) - timedelta(days=self.max_age_days)
+                # The cutoff excludes NULLs, so the batches can walk the timestamp index in order
+                by_age = await self._delete_batches(
+                    database, table, table.c.timestamp < cutoff, [table.c.timestamp.asc(), table.c.id.asc()]
+                )
+            if self.max_messages_per_session is not None:
+                keys = [table.c[name] for name in self.session_columns if name in table.c]
+                async with database.session() as session:
+                    sessions = (
+                        await session.execute(
+                            select(*keys, func.count().label("messages"))
+                            .group_by(*keys)
+                            .having(func.count() > self.max_messages_per_session)
+                        )
+                    ).all()
+                for session_key in sessions:
+                    condition = and_(*[column.is_not_distinct_from(value) for column, value in zip(keys, session_key)])
+                    excess = session_key.messages - self.max_messages_per_session
+                    by_count += await self._delete_batches(database, table, condition, oldest_first, excess)
+
+        seconds = time.perf_counter() - started
+        self.passes += 1
+        self.pruned_rows += by_age + by_count
+        self.last_pass = {
+            "by_age": by_age,
+            "by_count": by_count,
+            "seconds": round(seconds, 3),
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+        }
+        logger.info(f"Pruned {by_age + by_count} rows from '{self.table_name}': {self.last_pass}")
+        return self.last_pass
+
+    async def _run(self):
+        while True:
+            try:
+                await self.prune()
+            except Exception as e:
+                logger.error(f"Error pruning '{self.table_name}': {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def start_chat_retention(database: Optional[Database] = None) -> Optional[ChatRetention]:
+    """
+    Start the retention job of ``database`` when ``HIVE_AGENT_DB_RETENTION_DAYS`` or
+    ``HIVE_AGENT_DB_RETENTION_MAX_MESSAGES`` is set.
+
+    ``HIVE_AGENT_DB_RETENTION_INTERVAL_SECONDS`` and ``HIVE_AGENT_DB_RETENTION_BATCH_SIZE`` set how often
+    it runs and how many rows it deletes per transaction.
+    """
+    database = database or get_database()
+    max_age_days = os.getenv("HIVE_AGENT_DB_RETENTION_DAYS")
+    max_messages = os.getenv("HIVE_AGENT_DB_RETENTION_MAX_MESSAGES")
+    if database.retention is None and (max_age_days or max_messages):
+        database.retention = ChatRetention(
+            max_age_days=float(max_age_days) if max_age_days else None,
+            max_messages_per_session=int(max_messages) if max_messages else None,
+            interval_seconds=_env_int("HIVE_AGENT_DB_RETENTION_INTERVAL_SECONDS", 3600),
+            batch_size=_env_int("HIVE_AGENT_DB_RETENTION_BATCH_SIZE", 1000),
+            database=database,
+        )
+    if database.retention is not None:
+        database.retention.start()
+    return database.retention
+
+
+async def stop_chat_retention(database: Optional[Database] = None):
+    database = database or get_database()
+    if database.retention is not None:
+        await database.retention.stop()
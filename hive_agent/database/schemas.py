@@ -1,10 +1,19 @@
 from pydantic import BaseModel
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Union
+
+
+class IndexCreate(BaseModel):
+    columns: List[str]
+    unique: bool = False
+    name: Optional[str] = None
+    json_types: Optional[Dict[str, str]] = None
+    using: Optional[str] = None
 
 
 class TableCreate(BaseModel):
     table_name: str
     columns: Dict[str, str]
+    indexes: Optional[List[IndexCreate]] = None
 
 
 class DataInsert(BaseModel):
@@ -12,9 +21,34 @@ class DataInsert(BaseModel):
     data: Dict[str, Any]
 
 
+class DataInsertBatch(BaseModel):
+    table_name: str
+    data: List[Dict[str, Any]]
+
+
 class DataRead(BaseModel):
     table_name: str
-    filters: Optional[Dict[str, List[Any]]] = None
+    filters: Optional[Dict[str, Union[List[Any], Dict[str, Any]]]] = None
+    fields: Optional[List[str]] = None
+    limit: Optional[int] = None
+    order_by: Optional[List[str]] = None
+    cursor: Optional[str] = None
+
+
+class DataStream(BaseModel):
+    table_name: str
+    filters: Optional[Dict[str, Union[List[Any], Dict[str, Any]]]] = None
+    fields: Optional[List[str]] = None
+    order_by: Optional[List[str]] = None
+
+
+class DataExport(BaseModel):
+    table_name: str
+    format: str = "ndjson"
+    filters: Optional[Dict[str, Union[List[Any], Dict[str, Any]]]] = None
+    fields: Optional[List[str]] = None
+    order_by: Optional[List[str]] = None
+    batch_size: int = 1000
 
 
 class DataUpdate(BaseModel):
@@ -23,6 +57,30 @@ class DataUpdate(BaseModel):
     data: Dict[str, Any]
 
 
+class DataUpdateWhere(BaseModel):
+    table_name: str
+    filters: Dict[str, Union[List[Any], Dict[str, Any]]]
+    data: Dict[str, Any]
+
+
 class DataDelete(BaseModel):
     table_name: str
     id: int
+
+
+class DataDeleteWhere(BaseModel):
+    table_name: str
+    filters: Dict[str, Union[List[Any], Dict[str, Any]]]
+
+
+class AggregateSpec(BaseModel):
+    function: str
+    column: Optional[str] = None
+    json_type: Optional[str] = None
+
+
+class DataAggregate(BaseModel):
+    table_name: str
+    aggregates: Dict[str, AggregateSpec]
+    filters: Optional[Dict[str, Union[List[Any], Dict[str, Any]]]] = None
+    group_by: Optional[List[str]] = None
@@ -4,7 +4,13 @@ from datetime import datetime
 from typing import Any, Optional
 
 from hive_agent.config import Config
-from hive_agent.database.database import DatabaseManager, db_url, get_db, initialize_db, setup_chats_table
+from hive_agent.database.database import (
+    DatabaseManager,
+    ScopedDatabaseManager,
+    get_buffered_writer,
+    get_database,
+    setup_chats_table,
+)
 from sqlalchemy import MetaData, create_engine
 from sqlalchemy.sql import text as sql_text
 
@@ -24,13 +30,17 @@ class SDKContext:
     This includes configuration settings, resources, and utilities.
     """
 
-    def __init__(self, config_path: Optional[str] = "./hive_config_example.toml"):
+    def __init__(self, config_path: Optional[str] = "./hive_config_example.toml", database_url: Optional[str] = None):
         """
         Initialize the SDKContext with a path to a TOML configuration file.
 
         :param config_path: Path to the TOML configuration file.
+        :param database_url: Database URL, defaults to `url` in the `[database]` section of the
+            configuration file and then to the HIVE_AGENT_DATABASE_URL environment variable.
         """
         self.config = Config(config_path)
+        # No connection is made until the database is first used
+        self.database = get_database(database_url or self.config.get("database", "url"))
         self.default_config = self.load_default_config()
         self.agent_configs = self.load_agent_configs()
         self.resources = {}
@@ -62,7 +72,7 @@ class SDKContext:
         """
         agent_configs = {}
         for section in self.config.config:
-            if section not in ["model", "environment", "timeout", "log"]:
+            if section not in ["model", "environment", "timeout", "log", "database"]:
                 agent_configs[section] = {
                     "model": self.config.get(section, "model", self.default_config["model"]),
                     "environment": self.config.get(section, "environment", self.default_config["environment"]),
@@ -83,7 +93,7 @@ class SDKContext:
     def add_agent_config(self, file_path):
         agent_config = Config(file_path)
         for section in agent_config.config:
-            if section not in ["model", "environment", "timeout", "log"]:
+            if section not in ["model", "environment", "timeout", "log", "database"]:
                 agent_config = {
                     "model": self.config.get(section, "model", self.default_config["model"]),
                     "environment": self.config.get(section, "environment", self.default_config["environment"]),
@@ -110,7 +120,7 @@ class SDKContext:
         """
         agents = []
         for section in self.agent_configs:
-            if section not in ["model", "environment", "timeout", "log"]:
+            if section not in ["model", "environment", "timeout", "log", "database"]:
                 agent_config = self.agent_configs[section]
                 agent = HiveAgent(
                     name=section,
@@ -312,13 +322,13 @@ class SDKContext:
                 self.resources[name]["object"] = resource_obj
 
     async def initialize_database(self):
-        await initialize_db()
+        await self.database.initialize()
 
     async def save_sdk_context_to_db(self):
         await self.initialize_database()
 
-        async for db in get_db():
-            db_manager = DatabaseManager(db)
+        async for db in self.database.get_db():
+            db_manager = DatabaseManager(db, database=self.database)
 
             table_exists = await db_manager.get_table_definition("sdkcontext")
             if table_exists == None:
@@ -366,8 +376,8 @@ class SDKContext:
         """
         Load the SDK context from the database and restore non-serializable objects.
         """
-        async for db in get_db():
-            self.db_manager = DatabaseManager(db)
+        async for db in self.database.get_db():
+            self.db_manager = DatabaseManager(db, database=self.database)
 
             # Fetch the configuration data from the database
             config_record = await self.fetch_data("sdkcontext", {"type": "sdk_context"})
@@ -448,15 +458,15 @@ class SDKContext:
         """
 
         # if self.get_utility("text2sql_engine") is None:
-        #     engine = create_engine(db_url.replace("+aiosqlite", "").replace("+asyncpg", ""))
+        #     engine = create_engine(self.database.url.replace("+aiosqlite", "").replace("+asyncpg", ""))
         #     metadata = MetaData()
         #     metadata.reflect(bind=engine)
         #     self.add_utility(engine, utility_type="DBEngine", name="text2sql_engine")
         #     self.add_utility(metadata, utility_type="MetaData", name="text2sql_metadata")
         if self.get_utility("db_manager") is None:
-            await initialize_db()
-            async for db in get_db():
+            await self.initialize_database()
+            async with self.database.session() as db:
                 await setup_chats_table(db)
-                db_manager = DatabaseManager(db)
-                self.add_utility(db_manager, utility_type="DatabaseManager", name="db_manager")
-                break  # Exit after getting the first session
+            # Opens a session per operation, so concurrent chats can share it
+            db_manager = ScopedDatabaseManager(self.database, writer=get_buffered_writer(self.database))
+            self.add_utility(db_manager, utility_type="DatabaseManager", name="db_manager")
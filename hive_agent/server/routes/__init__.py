@@ -9,7 +9,13 @@ from .database import setup_database_routes
 from .files import setup_files_routes
 from .vectorindex import setup_vectorindex_routes
 
-from hive_agent.database.database import initialize_db, get_db, setup_chats_table
+from hive_agent.database.database import (
+    get_db,
+    setup_chats_table,
+    close_buffered_writer,
+    start_chat_retention,
+    stop_chat_retention,
+)
 from hive_agent.sdk_context import SDKContext
 
 
@@ -18,14 +24,25 @@ load_dotenv()
 
 def setup_routes(app: FastAPI, id: str,sdk_context: SDKContext):
 
+    database = sdk_context.database
+    # Routes depend on get_db, serve them from this context's database
+    app.dependency_overrides[get_db] = database.get_db
+
     @app.on_event("startup")
     async def startup_event():
 
-        await initialize_db()
+        await database.initialize()
 
-        async for db in get_db():
+        async for db in database.get_db():
             await setup_chats_table(db)
 
+        start_chat_retention(database)
+
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        await stop_chat_retention(database)
+        await close_buffered_writer(database)
+
     @app.get("/")
     def read_root():
         return {"message": "Hive Agent is running"}
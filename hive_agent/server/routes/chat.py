@@ -1,13 +1,15 @@
+import json
 import logging
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from fastapi import (APIRouter, Depends, File, Form, HTTPException, Query,
-                     Request, UploadFile, status)
+                     Request, Response, UploadFile, status)
+from fastapi.responses import StreamingResponse
 from hive_agent.chat import ChatManager
 from hive_agent.chat.schemas import ChatData, ChatHistorySchema
-from hive_agent.database.database import DatabaseManager, get_db
+from hive_agent.database.database import DatabaseManager, get_buffered_writer, get_db
 from hive_agent.llms.openai import OpenAIMultiModalLLM
 from hive_agent.sdk_context import SDKContext
 from hive_agent.server.routes.files import insert_files_to_index
@@ -62,6 +64,7 @@ def setup_chat_routes(router: APIRouter, id, sdk_context: SDKContext):
         session_id: str = Form(...),
         chat_data: str = Form(...),
         files: List[UploadFile] = File([]),
+        stream: bool = Form(False),
         db: AsyncSession = Depends(get_db),
     ):
         try:
@@ -79,20 +82,47 @@ def setup_chat_routes(router: APIRouter, id, sdk_context: SDKContext):
             llm_instance, user_id=user_id, session_id=session_id, enable_multi_modal=enable_multi_modal
         )
         db_manager = DatabaseManager(db)
+        db_manager.writer = get_buffered_writer(db_manager.database)
 
         last_message, _ = await validate_chat_data(chat_data_parsed)
 
         image_files = [file for file in stored_files if is_valid_image(file)]
 
+        if stream:
+            return StreamingResponse(
+                inject_additional_attributes(
+                    lambda: stream_events(chat_manager, db_manager, last_message, image_files),
+                    {"user_id": user_id}
+                ),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
         return await inject_additional_attributes(
             lambda: chat_manager.generate_response(db_manager, last_message, image_files),
             {"user_id": user_id}
         )
 
+    async def stream_events(chat_manager, db_manager, last_message, image_files):
+        # Server-sent events: a "data" event per token, then "done" or "error". The request-scoped
+        # session is closed before the body is sent, so the stream owns its own
+        async with db_manager.database.session() as session:
+            stream_db_manager = DatabaseManager(session, writer=db_manager.writer, database=db_manager.database)
+            try:
+                async for token in chat_manager.stream_response(stream_db_manager, last_message, image_files):
+                    yield f"data: {json.dumps({'delta': token})}\n\n"
+            except Exception as e:
+                logger.error(f"Exception while streaming a chat response: {str(e)}")
+                yield f"event: error\ndata: {json.dumps({'detail': 'Internal server error'})}\n\n"
+                return
+        yield "event: done\ndata: {}\n\n"
+
     @router.get("/chat_history", response_model=List[ChatHistorySchema])
     async def get_chat_history(
         user_id: str = Query(...),
         session_id: str = Query(...),
+        since: Optional[datetime] = Query(None),
+        until: Optional[datetime] = Query(None),
         db: AsyncSession = Depends(get_db),
     ):
 
@@ -100,7 +130,7 @@ def setup_chat_routes(router: APIRouter, id, sdk_context: SDKContext):
 
         chat_manager = ChatManager(llm_instance, user_id=user_id, session_id=session_id)
         db_manager = DatabaseManager(db)
-        chat_history = await chat_manager.get_messages(db_manager)
+        chat_history = await chat_manager.get_messages(db_manager, since=since, until=until)
         if not chat_history:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -119,13 +149,42 @@ def setup_chat_routes(router: APIRouter, id, sdk_context: SDKContext):
         ]
 
     @router.get("/all_chats")
-    async def get_all_chats(user_id: str = Query(...), db: AsyncSession = Depends(get_db)):
+    async def get_all_chats(
+        response: Response,
+        user_id: str = Query(...),
+        since: Optional[datetime] = Query(None),
+        until: Optional[datetime] = Query(None),
+        limit: int = Query(20, ge=1),
+        cursor: Optional[str] = Query(None),
+        messages_per_session: int = Query(20, ge=1),
+        db: AsyncSession = Depends(get_db),
+    ):
 
         llm_instance, enable_multi_modal = get_llm_instance(id, sdk_context)
 
         chat_manager = ChatManager(llm_instance, user_id=user_id, session_id="")
         db_manager = DatabaseManager(db)
-        all_chats = await chat_manager.get_all_chats_for_user(db_manager)
+        # A page of the most recently active sessions with their newest messages; a whole session is
+        # read by /chat_history when it is opened
+        try:
+            sessions, next_cursor = await chat_manager.get_sessions_for_user(
+                db_manager, since=since, until=until, limit=limit, cursor=cursor
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        session_ids = [session["session_id"] for session in sessions]
+        chats = {}
+        if session_ids:
+            chats = await chat_manager.get_all_chats_for_user(
+                db_manager,
+                since=since,
+                until=until,
+                session_ids=session_ids,
+                messages_per_session=messages_per_session,
+            )
+        all_chats = {session_id: chats[session_id] for session_id in session_ids if session_id in chats}
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
 
         if not all_chats:
             raise HTTPException(
@@ -134,3 +193,35 @@ def setup_chat_routes(router: APIRouter, id, sdk_context: SDKContext):
             )
 
         return all_chats
+
+    @router.get("/chat_sessions")
+    async def get_chat_sessions(
+        response: Response,
+        user_id: str = Query(...),
+        since: Optional[datetime] = Query(None),
+        until: Optional[datetime] = Query(None),
+        limit: int = Query(50, ge=1),
+        cursor: Optional[str] = Query(None),
+        db: AsyncSession = Depends(get_db),
+    ):
+
+        llm_instance, enable_multi_modal = get_llm_instance(id, sdk_context)
+
+        chat_manager = ChatManager(llm_instance, user_id=user_id, session_id="")
+        db_manager = DatabaseManager(db)
+        try:
+            sessions, next_cursor = await chat_manager.get_sessions_for_user(
+                db_manager, since=since, until=until, limit=limit, cursor=cursor
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+        if not sessions and cursor is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No chats found for this user",
+            )
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+
+        return sessions
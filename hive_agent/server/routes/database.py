@@ -1,16 +1,25 @@
+import json
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from hive_agent.chat.history_cache import get_history_cache
 from hive_agent.database.database import get_db, DatabaseManager
 from hive_agent.database.schemas import (
     TableCreate,
     DataInsert,
+    DataInsertBatch,
     DataUpdate,
+    DataUpdateWhere,
     DataDelete,
+    DataDeleteWhere,
     DataRead,
+    DataStream,
+    DataAggregate,
+    DataExport,
 )
 
 
@@ -18,6 +27,13 @@ from hive_agent.database.schemas import (
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Import format implied by the request Content-Type when none is given
+IMPORT_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
 
 def setup_database_routes(router: APIRouter):
     @router.post("/database/create-table", response_model=Dict[str, str])
@@ -27,7 +43,12 @@ def setup_database_routes(router: APIRouter):
         logger.info(f"Received request to create table: {table.table_name}")
         db_manager = DatabaseManager(db)
         try:
-            await db_manager.create_table(table.table_name, table.columns)
+            indexes = (
+                [index.model_dump(exclude_none=True) for index in table.indexes]
+                if table.indexes
+                else None
+            )
+            await db_manager.create_table(table.table_name, table.columns, indexes)
             logger.info(f"Table {table.table_name} created successfully.")
             return {"message": f"Table {table.table_name} created successfully."}
         except ValueError as e:
@@ -55,11 +76,22 @@ def setup_database_routes(router: APIRouter):
             raise HTTPException(status_code=500, detail="Internal server error")
 
     @router.post("/database/read-data", response_model=List[Dict[str, Any]])
-    async def read_data_handler(data: DataRead, db: AsyncSession = Depends(get_db)):
+    async def read_data_handler(
+        data: DataRead, response: Response, db: AsyncSession = Depends(get_db)
+    ):
         logger.info(f"Received request to read data from table: {data.table_name}")
         db_manager = DatabaseManager(db)
         try:
-            result = await db_manager.read_data(data.table_name, data.filters)
+            result, next_cursor = await db_manager.read_page(
+                data.table_name,
+                data.filters,
+                limit=data.limit,
+                order_by=data.order_by,
+                cursor=data.cursor,
+                fields=data.fields,
+            )
+            if next_cursor:
+                response.headers["X-Next-Cursor"] = next_cursor
             logger.info(f"Data read successfully from table {data.table_name}")
             return result
         except ValueError as e:
@@ -106,3 +138,244 @@ def setup_database_routes(router: APIRouter):
         except Exception as e:
             logger.error(f"Exception: {str(e)}")
             raise HTTPException(status_code=500, detail="Internal server error")
+
+    @router.post("/database/insert-data-batch", response_model=Dict[str, Any])
+    async def insert_data_batch_handler(
+        data: DataInsertBatch, db: AsyncSession = Depends(get_db)
+    ):
+        logger.info(
+            f"Received request to insert {len(data.data)} rows into table: {data.table_name}"
+        )
+        db_manager = DatabaseManager(db)
+        try:
+            ids = await db_manager.insert_many(data.table_name, data.data)
+            logger.info(
+                f"{len(ids)} rows inserted successfully into table {data.table_name}"
+            )
+            return {"message": "Data inserted successfully.", "ids": ids}
+        except ValueError as e:
+            logger.error(f"ValueError: {str(e)}")
+            raise HTTPException(status_code=404, detail=str(e))
+        except Exception as e:
+            logger.error(f"Exception: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+    @router.post("/database/read-data-stream")
+    async def read_data_stream_handler(
+        data: DataStream, db: AsyncSession = Depends(get_db)
+    ):
+        logger.info(f"Received request to stream data from table: {data.table_name}")
+        db_manager = DatabaseManager(db)
+        try:
+            # Once the response starts its status can't change, so check the query first
+            await db_manager.validate_read(
+                data.table_name,
+                data.filters,
+                order_by=data.order_by,
+                fields=data.fields,
+            )
+        except ValueError as e:
+            logger.error(f"ValueError: {str(e)}")
+            raise HTTPException(status_code=404, detail=str(e))
+        except Exception as e:
+            logger.error(f"Exception: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+        # The request-scoped session is closed before the body is sent, so the stream
+        # owns its own
+        async def ndjson_rows():
+            async with db_manager.database.session() as session:
+                stream_manager = DatabaseManager(session, database=db_manager.database)
+                rows = stream_manager.stream_data(
+                    data.table_name,
+                    data.filters,
+                    order_by=data.order_by,
+                    fields=data.fields,
+                )
+                async for row in rows:
+                    yield json.dumps(row, default=str) + "\n"
+
+        return StreamingResponse(ndjson_rows(), media_type="application/x-ndjson")
+
+    @router.put("/database/update-data-where", response_model=Dict[str, Any])
+    async def update_data_where_handler(
+        data: DataUpdateWhere, db: AsyncSession = Depends(get_db)
+    ):
+        logger.info(
+            f"Received request to update data in table: {data.table_name}, filters: {data.filters}"
+        )
+        db_manager = DatabaseManager(db)
+        try:
+            count = await db_manager.update_where(
+                data.table_name, data.filters, data.data
+            )
+            logger.info(f"{count} rows updated successfully in table {data.table_name}")
+            return {"message": "Data updated successfully.", "count": count}
+        except ValueError as e:
+            logger.error(f"ValueError: {str(e)}")
+            raise HTTPException(status_code=404, detail=str(e))
+        except Exception as e:
+            logger.error(f"Exception: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+    @router.delete("/database/delete-data-where", response_model=Dict[str, Any])
+    async def delete_data_where_handler(
+        data: DataDeleteWhere, db: AsyncSession = Depends(get_db)
+    ):
+        logger.info(
+            f"Received request to delete data from table: {data.table_name}, filters: {data.filters}"
+        )
+        db_manager = DatabaseManager(db)
+        try:
+            count = await db_manager.delete_where(data.table_name, data.filters)
+            logger.info(
+                f"{count} rows deleted successfully from table {data.table_name}"
+            )
+            return {"message": "Data deleted successfully.", "count": count}
+        except ValueError as e:
+            logger.error(f"ValueError: {str(e)}")
+            raise HTTPException(status_code=404, detail=str(e))
+        except Exception as e:
+            logger.error(f"Exception: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+    @router.post("/database/aggregate", response_model=List[Dict[str, Any]])
+    async def aggregate_handler(
+        data: DataAggregate, db: AsyncSession = Depends(get_db)
+    ):
+        logger.info(
+            f"Received request to aggregate table: {data.table_name}, group_by: {data.group_by}"
+        )
+        db_manager = DatabaseManager(db)
+        try:
+            aggregates = {
+                name: spec.model_dump() for name, spec in data.aggregates.items()
+            }
+            result = await db_manager.aggregate(
+                data.table_name, aggregates, data.filters, group_by=data.group_by
+            )
+            logger.info(f"Table {data.table_name} aggregated successfully")
+            return result
+        except ValueError as e:
+            logger.error(f"ValueError: {str(e)}")
+            raise HTTPException(status_code=404, detail=str(e))
+        except Exception as e:
+            logger.error(f"Exception: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+    @router.get("/database/stats", response_model=Dict[str, Any])
+    async def database_stats_handler(db: AsyncSession = Depends(get_db)):
+        logger.info("Received request for database statistics")
+        database = DatabaseManager(db).database
+        history_cache = get_history_cache(database)
+        return {
+            "queries": database.query_stats.snapshot(),
+            "definition_cache": database.definition_cache.stats(),
+            "write_behind": (
+                database.writer.stats() if database.writer is not None else None
+            ),
+            "retention": (
+                database.retention.stats() if database.retention is not None else None
+            ),
+            "chat_history_cache": (
+                history_cache.stats() if history_cache is not None else None
+            ),
+        }
+
+    @router.post("/database/export")
+    async def export_data_handler(data: DataExport, db: AsyncSession = Depends(get_db)):
+        logger.info(
+            f"Received request to export table {data.table_name} as {data.format}"
+        )
+        db_manager = DatabaseManager(db)
+        try:
+            columns = await db_manager.get_table_definition(data.table_name)
+            if not columns:
+                raise HTTPException(
+                    status_code=404, detail=f"Table '{data.table_name}' does not exist."
+                )
+            if data.batch_size < 1:
+                raise ValueError("batch_size must be a positive integer")
+            encoder = db_manager.export_encoder(data.format, columns, data.fields)
+            # Once the response starts its status can't change, so check the query first
+            await db_manager.validate_read(
+                data.table_name,
+                data.filters,
+                order_by=data.order_by,
+                fields=data.fields,
+            )
+        except HTTPException:
+            raise
+        except ValueError as e:
+            logger.error(f"ValueError: {str(e)}")
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            logger.error(f"Exception: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+        # The request-scoped session is closed before the body is sent, so the export
+        # owns its own
+        async def chunks():
+            async with db_manager.database.session() as session:
+                export_manager = DatabaseManager(session, database=db_manager.database)
+                async for chunk in export_manager.export_data(
+                    data.table_name,
+                    data.format,
+                    data.filters,
+                    order_by=data.order_by,
+                    fields=data.fields,
+                    batch_size=data.batch_size,
+                ):
+                    yield chunk
+
+        filename = f"{data.table_name}.{encoder.extension}"
+        return StreamingResponse(
+            chunks(),
+            media_type=encoder.media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
+
+    @router.post("/database/import", response_model=Dict[str, Any])
+    async def import_data_handler(
+        request: Request,
+        table_name: str,
+        format: Optional[str] = None,
+        batch_size: int = 5000,
+        db: AsyncSession = Depends(get_db),
+    ):
+        logger.info(f"Received request to import data into table: {table_name}")
+        content_type = (
+            request.headers.get("content-type", "").split(";")[0].strip().lower()
+        )
+        format = format or IMPORT_CONTENT_TYPES.get(content_type)
+        if format is None:
+            raise HTTPException(
+                status_code=400,
+                detail=(
+                    "Set format to csv or ndjson, "
+                    "or send the file as text/csv or application/x-ndjson"
+                ),
+            )
+
+        db_manager = DatabaseManager(db)
+        try:
+            if not await db_manager.get_table_definition(table_name):
+                raise HTTPException(
+                    status_code=404, detail=f"Table '{table_name}' does not exist."
+                )
+            # The body is parsed as it arrives, so the file is never held in memory
+            progress = None
+            async for progress in db_manager.import_data(
+                table_name, request.stream(), format, batch_size
+            ):
+                pass
+            logger.info(f"Data imported into table {table_name}: {progress}")
+            return progress
+        except HTTPException:
+            raise
+        except ValueError as e:
+            logger.error(f"ValueError: {str(e)}")
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            logger.error(f"Exception: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
@@ -1,9 +1,10 @@
 import os
 import string
 import uuid
+from datetime import datetime
 
 from dotenv import load_dotenv
-from typing import List, Dict, Any, Optional, Callable
+from typing import List, Dict, Any, AsyncIterator, Optional, Callable
 
 from langtrace_python_sdk import inject_additional_attributes
 from llama_index.core.agent import AgentRunner, ReActAgent
@@ -137,13 +138,39 @@ class HiveSwarm:
         )
         return response
 
-    async def chat_history(self, user_id="default_user", session_id="default_chat") -> dict[str, list]:
+    async def stream_chat(
+        self,
+        prompt: str,
+        user_id="default_user",
+        session_id="default_chat",
+        image_document_paths: Optional[List[str]] = [],
+    ) -> AsyncIterator[str]:
+        await self._ensure_utilities_loaded()
+        db_manager = self.sdk_context.get_utility("db_manager")
+
+        chat_manager = ChatManager(self.__swarm, user_id=user_id, session_id=session_id)
+        last_message = ChatMessage(role=MessageRole.USER, content=prompt)
+
+        response_stream = inject_additional_attributes(
+            lambda: chat_manager.stream_response(db_manager, last_message, image_document_paths),
+            {"user_id": user_id}
+        )
+        async for token in response_stream:
+            yield token
+
+    async def chat_history(
+        self,
+        user_id="default_user",
+        session_id="default_chat",
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> dict[str, list]:
         await self._ensure_utilities_loaded()
         db_manager = self.sdk_context.get_utility("db_manager")
 
         chat_manager = ChatManager(self.__swarm, user_id=user_id, session_id=session_id)
 
-        chats = await chat_manager.get_all_chats_for_user(db_manager)
+        chats = await chat_manager.get_all_chats_for_user(db_manager, since=since, until=until)
         return chats
 
     def _format_tool_name(self, name: str) -> str:
@@ -29,6 +29,7 @@ setup(
     ],
     extras_require={
         "web3": ["web3==7.2.0", "py-solc-x==2.0.3", "eth-account==0.13.3"],
+        "parquet": ["pyarrow==17.0.0"],
     },
     python_requires=">=3.11",
 )
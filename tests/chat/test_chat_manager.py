@@ -1,7 +1,11 @@
+from datetime import datetime, timezone
 from unittest.mock import MagicMock, patch
 
+import anyio
 import pytest
 from hive_agent.chat import ChatManager
+from hive_agent.chat.history_cache import ChatHistoryCache
+from hive_agent.database.database import DatabaseManager, get_database, setup_chats_table
 from llama_index.agent.openai import OpenAIAgent  # type: ignore
 from llama_index.core.llms import ChatMessage, MessageRole
 from llama_index.multi_modal_llms.openai import \
@@ -33,12 +37,28 @@ class MockMultiModalAgent:
 class MockDatabaseManager:
     def __init__(self):
         self.data = []
+        self.reads = 0
 
     async def insert_data(self, table_name: str, data: dict):
         self.data.append(data)
 
+    async def enqueue_insert(self, table_name: str, data: dict):
+        await self.insert_data(table_name, data)
+
+    async def enqueue_insert_many(self, table_name: str, rows: list):
+        self.data.extend(rows)
+
     async def read_data(self, table_name: str, filters: dict):
-        return [d for d in self.data if all(d[k] == v[0] for k, v in filters.items())]
+        self.reads += 1
+        return [d for d in self.data if all(self._matches(d[k], v) for k, v in filters.items())]
+
+    @staticmethod
+    def _matches(value, condition):
+        if isinstance(condition, dict):
+            return ("gte" not in condition or value >= condition["gte"]) and (
+                "lt" not in condition or value < condition["lt"]
+            )
+        return value == condition[0]
 
 
 @pytest.fixture
@@ -60,6 +80,22 @@ def db_manager():
     return MockDatabaseManager()
 
 
+@pytest.fixture
+async def database(tmp_path):
+    database = get_database(f"sqlite+aiosqlite:///{tmp_path / 'chats.db'}")
+    await database.initialize()
+    async with database.session() as db:
+        await setup_chats_table(db)
+    yield database
+    await database.dispose()
+
+
+async def stored_turns(database):
+    async with database.session() as db:
+        rows = await DatabaseManager(db, database=database).read_data("chats")
+    return [(row["role"], row["message"]) for row in rows]
+
+
 @pytest.mark.asyncio
 async def test_add_message(agent, db_manager):
     chat_manager = ChatManager(agent, user_id="123", session_id="abc")
@@ -69,6 +105,27 @@ async def test_add_message(agent, db_manager):
     assert messages[0].content == "Hello!"
 
 
+@pytest.mark.asyncio
+async def test_get_messages_time_window(agent, db_manager):
+    chat_manager = ChatManager(agent, user_id="123", session_id="abc")
+    for day in (1, 2, 3):
+        with patch("hive_agent.chat.chat_manager.datetime") as mock_datetime:
+            mock_datetime.now.return_value = datetime(2024, 1, day, 12, tzinfo=timezone.utc)
+            await chat_manager.add_message(db_manager, MessageRole.USER, f"day {day}")
+
+    assert db_manager.data[0]["timestamp"] == datetime(2024, 1, 1, 12)
+
+    since = datetime(2024, 1, 2, tzinfo=timezone.utc)
+    messages = await chat_manager.get_messages(db_manager, since=since)
+    assert [message.content for message in messages] == ["day 2", "day 3"]
+
+    messages = await chat_manager.get_messages(db_manager, since=since, until=datetime(2024, 1, 3, 12))
+    assert [message.content for message in messages] == ["day 2"]
+
+    all_chats = await chat_manager.get_all_chats_for_user(db_manager, until=since)
+    assert all_chats == {"abc": [{"message": "day 1", "role": "user", "timestamp": "2024-01-01T12:00:00+00:00"}]}
+
+
 @pytest.mark.asyncio
 async def test_generate_response_with_generic_llm(agent, db_manager):
     chat_manager = ChatManager(agent, user_id="123", session_id="abc")
@@ -83,6 +140,136 @@ async def test_generate_response_with_generic_llm(agent, db_manager):
     assert messages[1].content == "chat response"
 
 
+class MockStreamingAgent:
+    async def astream_chat(self, content, chat_history=None):
+        async def async_response_gen():
+            for token in ("chat", " ", "response"):
+                yield token
+
+        return type("MockResponse", (), {"async_response_gen": async_response_gen})
+
+
+@pytest.mark.asyncio
+async def test_failed_turn_is_not_stored(db_manager):
+    class FailingAgent:
+        async def astream_chat(self, content, chat_history=None):
+            raise RuntimeError("LLM unavailable")
+
+    chat_manager = ChatManager(FailingAgent(), user_id="123", session_id="abc")
+    with pytest.raises(RuntimeError):
+        await chat_manager.generate_response(db_manager, ChatMessage(role=MessageRole.USER, content="Hello!"))
+    assert db_manager.data == []
+
+    # The turn after it is stored as one batch, the user message first
+    chat_manager.llm = MockStreamingAgent()
+    await chat_manager.generate_response(db_manager, ChatMessage(role=MessageRole.USER, content="Hello again!"))
+    assert [(row["role"], row["message"]) for row in db_manager.data] == [
+        ("user", "Hello again!"),
+        (MessageRole.ASSISTANT, "chat response"),
+    ]
+    assert db_manager.data[0]["timestamp"] <= db_manager.data[1]["timestamp"]
+
+
+@pytest.mark.asyncio
+async def test_stream_response(db_manager):
+    chat_manager = ChatManager(MockStreamingAgent(), user_id="123", session_id="abc")
+    user_message = ChatMessage(role=MessageRole.USER, content="Hello!")
+
+    tokens = [token async for token in chat_manager.stream_response(db_manager, user_message)]
+    assert tokens == ["chat", " ", "response"]
+
+    messages = await chat_manager.get_messages(db_manager)
+    assert [message.content for message in messages] == ["Hello!", "chat response"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_stream_stores_the_partial_answer(db_manager):
+    chat_manager = ChatManager(MockStreamingAgent(), user_id="123", session_id="abc")
+    response_stream = chat_manager.stream_response(db_manager, ChatMessage(role=MessageRole.USER, content="Hello!"))
+
+    assert await response_stream.__anext__() == "chat"
+    await response_stream.aclose()
+
+    messages = await chat_manager.get_messages(db_manager)
+    assert [(message.role, message.content) for message in messages] == [
+        (MessageRole.USER, "Hello!"),
+        (MessageRole.ASSISTANT, "chat"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_disconnected_stream_stores_the_turn(database):
+    class SlowStreamingAgent:
+        async def astream_chat(self, content, chat_history=None):
+            async def async_response_gen():
+                yield "chat"
+                await anyio.sleep(10)
+                yield " response"
+
+            return type("MockResponse", (), {"async_response_gen": async_response_gen})
+
+    chat_manager = ChatManager(SlowStreamingAgent(), user_id="123", session_id="abc", history_cache=ChatHistoryCache())
+
+    # As StreamingResponse does when the client disconnects: the task group streaming the body is cancelled
+    async def stream_body(task_group):
+        async with database.session() as db:
+            db_manager = DatabaseManager(db, database=database)
+            async for _ in chat_manager.stream_response(db_manager, ChatMessage(role=MessageRole.USER, content="Hello!")):
+                task_group.cancel_scope.cancel()
+
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(stream_body, task_group)
+
+    assert await stored_turns(database) == [("user", "Hello!"), ("assistant", "chat")]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_turn_is_stored_whole(database):
+    class CancellingAgent:
+        # The response is cancelled just as the answer arrives, before the turn is written
+        def __init__(self, cancel_scope):
+            self.cancel_scope = cancel_scope
+
+        async def astream_chat(self, content, chat_history=None):
+            async def async_response_gen():
+                self.cancel_scope.cancel()
+                yield "chat response"
+
+            return type("MockResponse", (), {"async_response_gen": async_response_gen})
+
+    with anyio.CancelScope() as cancel_scope:
+        chat_manager = ChatManager(CancellingAgent(cancel_scope), user_id="123", session_id="abc")
+        async with database.session() as db:
+            db_manager = DatabaseManager(db, database=database)
+            await chat_manager.generate_response(db_manager, ChatMessage(role=MessageRole.USER, content="Hello!"))
+
+    assert await stored_turns(database) == [("user", "Hello!"), ("assistant", "chat response")]
+
+
+@pytest.mark.asyncio
+async def test_history_cache_write_through(agent, db_manager):
+    history_cache = ChatHistoryCache()
+    chat_manager = ChatManager(agent, user_id="123", session_id="abc", history_cache=history_cache)
+
+    for turn in range(3):
+        await chat_manager.generate_response(db_manager, ChatMessage(role=MessageRole.USER, content=f"turn {turn}"))
+
+    # Only the first turn read the session; later turns were served from the cache
+    assert db_manager.reads == 1
+    messages = await chat_manager.get_messages(db_manager)
+    assert [message.content for message in messages] == [
+        "turn 0", "chat response", "turn 1", "chat response", "turn 2", "chat response"
+    ]
+    assert messages[1].role == MessageRole.ASSISTANT
+    assert history_cache.stats()["hits"] == 3
+
+    # Another session and time-windowed reads go to the database
+    other = ChatManager(agent, user_id="123", session_id="other", history_cache=history_cache)
+    assert await other.get_messages(db_manager) == []
+    await chat_manager.get_messages(db_manager, since=datetime(2024, 1, 1, tzinfo=timezone.utc))
+    assert db_manager.reads == 3
+
+
 @pytest.mark.asyncio
 async def test_get_all_chats_for_user(agent, db_manager):
     chat_manager1 = ChatManager(agent, user_id="123", session_id="abc")
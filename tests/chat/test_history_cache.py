@@ -0,0 +1,172 @@
+import os
+from unittest.mock import patch
+
+import pytest
+from hive_agent.chat import ChatManager
+from hive_agent.chat.history_cache import ChatHistoryCache, get_history_cache
+from hive_agent.database.database import (
+    ChatRetention,
+    DatabaseManager,
+    get_database,
+    setup_chats_table,
+)
+from llama_index.core.llms import ChatMessage, MessageRole
+
+
+def history(*contents):
+    return [ChatMessage(role=MessageRole.USER, content=content) for content in contents]
+
+
+def test_lru_eviction_by_sessions_and_messages():
+    cache = ChatHistoryCache(max_sessions=2, max_messages=5)
+    cache.set(("u", "a"), history("1", "2"))
+    cache.set(("u", "b"), history("3"))
+    assert cache.get(("u", "a")) is not None
+
+    # "b" is the least recently used session
+    cache.set(("u", "c"), history("4"))
+    assert cache.get(("u", "b")) is None
+    assert cache.stats()["sessions"] == 2
+
+    # Growing "c" past the message budget evicts "a"
+    for content in ("5", "6", "7"):
+        cache.append(("u", "c"), ChatMessage(role=MessageRole.USER, content=content))
+    assert cache.get(("u", "a")) is None
+    assert [message.content for message in cache.get(("u", "c"))] == [
+        "4",
+        "5",
+        "6",
+        "7",
+    ]
+
+    # A history longer than the whole budget is not cached
+    cache.set(("u", "d"), history(*"abcdef"))
+    assert cache.get(("u", "d")) is None
+
+    stats = cache.stats()
+    assert stats["messages"] == 4
+    assert stats["evictions"] == 2
+    assert (stats["hits"], stats["misses"]) == (2, 3)
+    assert stats["hit_rate"] == 0.4
+
+
+def test_get_returns_a_copy():
+    cache = ChatHistoryCache()
+    cache.set(("u", "a"), history("1"))
+    cache.get(("u", "a")).append(ChatMessage(role=MessageRole.USER, content="2"))
+    assert len(cache.get(("u", "a"))) == 1
+
+
+def test_append_ignores_uncached_sessions():
+    cache = ChatHistoryCache()
+    cache.append(("u", "a"), ChatMessage(role=MessageRole.USER, content="1"))
+    assert cache.get(("u", "a")) is None
+    assert cache.stats()["messages"] == 0
+
+
+def test_load_raced_by_a_clear_is_not_cached():
+    cache = ChatHistoryCache()
+    token = cache.begin_load(("u", "a"))
+    cache.clear()
+    cache.set(("u", "a"), history("1"), token)
+    assert cache.get(("u", "a")) is None
+
+
+def test_load_raced_by_a_write_is_not_cached():
+    cache = ChatHistoryCache()
+    token = cache.begin_load(("u", "a"))
+    cache.append(
+        ("u", "a"), ChatMessage(role=MessageRole.USER, content="stored during the read")
+    )
+    cache.set(("u", "a"), history("1"), token)
+    assert cache.get(("u", "a")) is None
+
+    token = cache.begin_load(("u", "a"))
+    cache.set(("u", "a"), history("1", "2"), token)
+    assert len(cache.get(("u", "a"))) == 2
+
+    cache.begin_load(("u", "b"))
+    cache.end_load(("u", "b"))
+    assert cache._loads == {}
+
+
+def test_ttl():
+    cache = ChatHistoryCache(ttl=10)
+    with patch("hive_agent.chat.history_cache.time.monotonic", return_value=100):
+        cache.set(("u", "a"), history("1"))
+    with patch("hive_agent.chat.history_cache.time.monotonic", return_value=105):
+        assert cache.get(("u", "a")) is not None
+    with patch("hive_agent.chat.history_cache.time.monotonic", return_value=111):
+        assert cache.get(("u", "a")) is None
+
+
+def test_invalid_budgets():
+    with pytest.raises(ValueError):
+        ChatHistoryCache(max_sessions=0)
+
+
+def test_get_history_cache_is_shared_per_database():
+    database = type(
+        "Database",
+        (),
+        {"url": "sqlite+aiosqlite:///history-cache-test.db", "change_listeners": []},
+    )()
+    with patch.dict(
+        "os.environ",
+        {"HIVE_AGENT_CHAT_CACHE_SESSIONS": "10", "HIVE_AGENT_CHAT_CACHE_TTL": "30"},
+    ):
+        cache = get_history_cache(database)
+    assert cache.max_sessions == 10
+    assert cache.ttl == 30
+    assert get_history_cache(database) is cache
+
+    # Changes to other tables leave the cache alone, changes to chats clear it
+    cache.set(("u", "a"), history("1"))
+    for listener in database.change_listeners:
+        listener("items")
+    assert cache.stats()["sessions"] == 1
+    for listener in database.change_listeners:
+        listener("chats")
+    assert cache.stats()["sessions"] == 0
+
+    disabled = type(
+        "Database",
+        (),
+        {
+            "url": "sqlite+aiosqlite:///history-cache-disabled.db",
+            "change_listeners": [],
+        },
+    )()
+    with patch.dict("os.environ", {"HIVE_AGENT_CHAT_CACHE_SESSIONS": "0"}):
+        assert get_history_cache(disabled) is None
+
+
+async def test_pruned_and_deleted_messages_leave_the_cache(tmp_path):
+    database = get_database(f"sqlite+aiosqlite:///{tmp_path / 'cache.db'}")
+    await database.initialize()
+    chat_manager = ChatManager(None, user_id="u", session_id="s")
+    with patch.dict(os.environ):
+        for name in ("HIVE_AGENT_ID", "HIVE_SWARM_ID"):
+            os.environ.pop(name, None)
+        async with database.session() as db:
+            await setup_chats_table(db)
+            db_manager = DatabaseManager(db, database=database)
+            for turn in range(5):
+                await chat_manager.add_message(db_manager, "user", f"question {turn}")
+                await chat_manager.add_message(
+                    db_manager, "assistant", f"answer {turn}"
+                )
+            assert len(await chat_manager.get_messages(db_manager)) == 10
+            assert len(await chat_manager.get_messages(db_manager)) == 10
+
+            await ChatRetention(max_messages_per_session=2, database=database).prune()
+            messages = await chat_manager.get_messages(db_manager)
+            assert [message.content for message in messages] == [
+                "question 4",
+                "answer 4",
+            ]
+
+            await db_manager.delete_where("chats", {"message": ["answer 4"]})
+            messages = await chat_manager.get_messages(db_manager)
+            assert [message.content for message in messages] == ["question 4"]
+    await database.dispose()
@@ -0,0 +1,248 @@
+import os
+from unittest.mock import patch
+
+import pytest
+from hive_agent.chat import ChatManager
+from hive_agent.chat.history_cache import ChatHistoryCache
+from hive_agent.chat.history_window import HistoryWindow
+from hive_agent.database.database import (
+    DatabaseManager,
+    get_database,
+    setup_chats_table,
+)
+from llama_index.core.llms import ChatMessage, MessageRole
+
+
+class MockSummaryLLM:
+    def __init__(self):
+        self.requests = []
+
+    async def achat(self, messages):
+        self.requests.append(messages)
+        transcript = messages[-1].content.split("New messages:\n", 1)[1]
+        return type(
+            "MockResponse",
+            (),
+            {"message": ChatMessage(role=MessageRole.ASSISTANT, content=transcript)},
+        )
+
+
+class MockRunner:
+    def __init__(self):
+        self.agent_worker = type("MockWorker", (), {"_llm": MockSummaryLLM()})()
+        self.chat_histories = []
+
+    async def astream_chat(self, content, chat_history=None):
+        self.chat_histories.append(chat_history)
+
+        async def async_response_gen():
+            yield f"answer to {content}"
+
+        return type("MockResponse", (), {"async_response_gen": async_response_gen})
+
+
+@pytest.fixture(autouse=True)
+def no_agent_env():
+    with patch.dict(os.environ):
+        for name in ("HIVE_AGENT_ID", "HIVE_SWARM_ID"):
+            os.environ.pop(name, None)
+        yield
+
+
+@pytest.fixture
+async def database(tmp_path):
+    database = get_database(f"sqlite+aiosqlite:///{tmp_path / 'history.db'}")
+    await database.initialize()
+    async with database.session() as db:
+        await setup_chats_table(db)
+    yield database
+    await database.dispose()
+
+
+async def store_turns(database, chat_manager, turns):
+    async with database.session() as db:
+        db_manager = DatabaseManager(db, database=database)
+        for turn in turns:
+            await chat_manager.add_message(db_manager, "user", f"question {turn}")
+            await chat_manager.add_message(db_manager, "assistant", f"answer {turn}")
+
+
+def contents(chat_history):
+    return [message.content for message in chat_history]
+
+
+def test_window_from_env():
+    with patch.dict(os.environ, {}, clear=True):
+        assert HistoryWindow.from_env() is None
+    with patch.dict(
+        os.environ,
+        {
+            "HIVE_AGENT_CHAT_HISTORY_TOKENS": "2000",
+            "HIVE_AGENT_CHAT_HISTORY_SUMMARY": "false",
+        },
+        clear=True,
+    ):
+        window = HistoryWindow.from_env()
+    assert (window.max_messages, window.max_tokens, window.summarize) == (
+        None,
+        2000,
+        False,
+    )
+    with pytest.raises(ValueError):
+        HistoryWindow()
+
+
+async def test_last_messages_without_summary(database):
+    window = HistoryWindow(max_messages=3, summarize=False)
+    chat_manager = ChatManager(
+        MockRunner(),
+        "user",
+        "session",
+        history_cache=ChatHistoryCache(),
+        history_window=window,
+    )
+    await store_turns(database, chat_manager, range(5))
+
+    async with database.session() as db:
+        chat_history = await chat_manager.get_history_window(
+            DatabaseManager(db, database=database)
+        )
+    assert contents(chat_history) == ["answer 3", "question 4", "answer 4"]
+
+
+async def test_token_budget_pages_back_from_the_newest_message(database):
+    # One token per word: each stored message is two tokens
+    window = HistoryWindow(
+        max_tokens=7, summarize=False, page_size=2, tokenizer=str.split
+    )
+    chat_manager = ChatManager(
+        MockRunner(),
+        "user",
+        "session",
+        history_cache=ChatHistoryCache(),
+        history_window=window,
+    )
+    await store_turns(database, chat_manager, range(5))
+
+    async with database.session() as db:
+        chat_history = await chat_manager.get_history_window(
+            DatabaseManager(db, database=database)
+        )
+    assert contents(chat_history) == ["answer 3", "question 4", "answer 4"]
+
+
+async def test_older_messages_fold_into_a_persisted_summary(database):
+    runner = MockRunner()
+    llm = runner.agent_worker._llm
+    window = HistoryWindow(max_messages=2, summary_batch=4)
+    chat_manager = ChatManager(
+        runner,
+        "user",
+        "session",
+        history_cache=ChatHistoryCache(),
+        history_window=window,
+    )
+
+    # Two messages have left the window: too few to summarize, so they are still sent as
+    # they are
+    await store_turns(database, chat_manager, range(2))
+    async with database.session() as db:
+        chat_history = await chat_manager.get_history_window(
+            DatabaseManager(db, database=database)
+        )
+    assert contents(chat_history) == [
+        "question 0",
+        "answer 0",
+        "question 1",
+        "answer 1",
+    ]
+    assert llm.requests == []
+
+    # Four have: they become the summary, sent ahead of the window
+    await store_turns(database, chat_manager, range(2, 3))
+    async with database.session() as db:
+        db_manager = DatabaseManager(db, database=database)
+        chat_history = await chat_manager.get_history_window(db_manager)
+        summaries = await db_manager.read_data("chat_summaries")
+    assert chat_history[0].role == MessageRole.SYSTEM
+    assert chat_history[0].content.endswith(
+        "user: question 0\nassistant: answer 0\nuser: question 1\nassistant: answer 1"
+    )
+    assert contents(chat_history[1:]) == ["question 2", "answer 2"]
+    assert len(llm.requests) == 1
+    assert (summaries[0]["session_id"], summaries[0]["message_count"]) == ("session", 4)
+
+    # The next turn reuses the stored summary and only reads the messages after it
+    async with database.session() as db:
+        chat_history = await chat_manager.get_history_window(
+            DatabaseManager(db, database=database)
+        )
+    assert len(llm.requests) == 1
+    assert contents(chat_history[1:]) == ["question 2", "answer 2"]
+
+    # Once another batch has left the window the summary is updated rather than rebuilt
+    await store_turns(database, chat_manager, range(3, 5))
+    async with database.session() as db:
+        db_manager = DatabaseManager(db, database=database)
+        chat_history = await chat_manager.get_history_window(db_manager)
+        summaries = await db_manager.read_data("chat_summaries")
+    assert len(llm.requests) == 2
+    assert "Current summary:\nuser: question 0" in llm.requests[1][-1].content
+    assert contents(chat_history[1:]) == ["question 4", "answer 4"]
+    assert len(summaries) == 1
+    assert summaries[0]["message_count"] == 8
+
+
+async def test_failed_fold_keeps_the_messages_in_the_prompt(database):
+    runner = MockRunner()
+
+    async def failing_achat(messages):
+        raise RuntimeError("LLM unavailable")
+
+    runner.agent_worker._llm.achat = failing_achat
+    window = HistoryWindow(max_messages=2, summary_batch=2)
+    chat_manager = ChatManager(
+        runner,
+        "user",
+        "session",
+        history_cache=ChatHistoryCache(),
+        history_window=window,
+    )
+    await store_turns(database, chat_manager, range(3))
+
+    async with database.session() as db:
+        db_manager = DatabaseManager(db, database=database)
+        chat_history = await chat_manager.get_history_window(db_manager)
+        summaries = await db_manager.read_data("chat_summaries")
+    assert contents(chat_history) == [
+        "question 0",
+        "answer 0",
+        "question 1",
+        "answer 1",
+        "question 2",
+        "answer 2",
+    ]
+    assert summaries == []
+
+
+async def test_generate_response_sends_the_window(database):
+    runner = MockRunner()
+    window = HistoryWindow(max_messages=2, summarize=False)
+    chat_manager = ChatManager(
+        runner,
+        "user",
+        "session",
+        history_cache=ChatHistoryCache(),
+        history_window=window,
+    )
+    await store_turns(database, chat_manager, range(3))
+
+    async with database.session() as db:
+        db_manager = DatabaseManager(db, database=database)
+        response = await chat_manager.generate_response(
+            db_manager, ChatMessage(role=MessageRole.USER, content="question 3")
+        )
+        stored = await db_manager.read_data("chats")
+    assert response == "answer to question 3"
+    assert contents(runner.chat_histories[0]) == ["question 2", "answer 2"]
+    assert len(stored) == 8
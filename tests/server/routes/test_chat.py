@@ -152,6 +152,57 @@ async def test_chat_with_image(client, agent):
         )
 
 
+@pytest.mark.asyncio
+async def test_chat_stream(client):
+    async def stream_response(db_manager, last_message, image_document_paths):
+        yield "chat"
+        yield " response\n"
+
+    with patch("hive_agent.server.routes.chat.ChatManager.stream_response", side_effect=stream_response), \
+         patch('hive_agent.server.routes.chat.insert_files_to_index', return_value=[]), \
+         patch("hive_agent.server.routes.chat.inject_additional_attributes", new=lambda fn, attributes=None: fn()):
+
+        payload = {
+            "user_id": "user1",
+            "session_id": "session1",
+            "chat_data": '{"messages":[{"role": "user", "content": "Hello!"}]}',
+            "stream": "true",
+        }
+
+        response = await client.post("/api/v1/chat", data=payload)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert response.text == (
+            'data: {"delta": "chat"}\n\n'
+            'data: {"delta": " response\\n"}\n\n'
+            "event: done\ndata: {}\n\n"
+        )
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_error(client):
+    async def stream_response(db_manager, last_message, image_document_paths):
+        yield "chat"
+        raise RuntimeError("LLM unavailable")
+
+    with patch("hive_agent.server.routes.chat.ChatManager.stream_response", side_effect=stream_response), \
+         patch('hive_agent.server.routes.chat.insert_files_to_index', return_value=[]), \
+         patch("hive_agent.server.routes.chat.inject_additional_attributes", new=lambda fn, attributes=None: fn()):
+
+        payload = {
+            "user_id": "user1",
+            "session_id": "session1",
+            "chat_data": '{"messages":[{"role": "user", "content": "Hello!"}]}',
+            "stream": "true",
+        }
+
+        response = await client.post("/api/v1/chat", data=payload)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.text.endswith('event: error\ndata: {"detail": "Internal server error"}\n\n')
+
+
 @pytest.mark.asyncio
 async def test_get_chat_history_success(client):
     user_id = "user1"
@@ -201,6 +252,10 @@ async def test_get_all_chats_success(client):
     }
 
     mock_chat_manager = AsyncMock()
+    mock_chat_manager.get_sessions_for_user.return_value = (
+        [{"session_id": "session1"}, {"session_id": "session2"}],
+        None,
+    )
     mock_chat_manager.get_all_chats_for_user.return_value = expected_all_chats
 
     with patch("hive_agent.server.routes.chat.ChatManager", return_value=mock_chat_manager):
@@ -208,4 +263,62 @@ async def test_get_all_chats_success(client):
         assert response.status_code == status.HTTP_200_OK
 
         response_data = response.json()
-        assert response_data == expected_all_chats
\ No newline at end of file
+        assert response_data == expected_all_chats
+
+        # Paged and bounded by default
+        mock_chat_manager.get_sessions_for_user.assert_called_once_with(
+            ANY, since=None, until=None, limit=20, cursor=None
+        )
+        mock_chat_manager.get_all_chats_for_user.assert_called_once_with(
+            ANY, since=None, until=None, session_ids=["session1", "session2"], messages_per_session=20
+        )
+
+
+@pytest.mark.asyncio
+async def test_get_all_chats_paginated(client):
+    sessions = [{"session_id": "session2"}, {"session_id": "session1"}]
+    mock_chat_manager = AsyncMock()
+    mock_chat_manager.get_sessions_for_user.return_value = (sessions, "next-page")
+    mock_chat_manager.get_all_chats_for_user.return_value = {
+        "session1": [{"message": "Hello in session1", "role": "USER", "timestamp": "timestamp1"}],
+        "session2": [{"message": "Hello in session2", "role": "USER", "timestamp": "timestamp2"}],
+    }
+
+    with patch("hive_agent.server.routes.chat.ChatManager", return_value=mock_chat_manager):
+        response = await client.get("/api/v1/all_chats?user_id=user1&limit=2&messages_per_session=5")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["X-Next-Cursor"] == "next-page"
+        assert list(response.json()) == ["session2", "session1"]
+
+        mock_chat_manager.get_sessions_for_user.assert_called_once_with(
+            ANY, since=None, until=None, limit=2, cursor=None
+        )
+        mock_chat_manager.get_all_chats_for_user.assert_called_once_with(
+            ANY, since=None, until=None, session_ids=["session2", "session1"], messages_per_session=5
+        )
+
+
+@pytest.mark.asyncio
+async def test_get_chat_sessions(client):
+    sessions = [
+        {
+            "session_id": "session1",
+            "message_count": 2,
+            "first_timestamp": "2024-01-01T00:00:00+00:00",
+            "last_timestamp": "2024-01-02T00:00:00+00:00",
+            "last_role": "assistant",
+            "last_message": "Hi there!",
+        }
+    ]
+    mock_chat_manager = AsyncMock()
+    mock_chat_manager.get_sessions_for_user.return_value = (sessions, None)
+
+    with patch("hive_agent.server.routes.chat.ChatManager", return_value=mock_chat_manager):
+        response = await client.get("/api/v1/chat_sessions?user_id=user1&limit=10")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == sessions
+        assert "X-Next-Cursor" not in response.headers
+
+        mock_chat_manager.get_sessions_for_user.side_effect = ValueError("Invalid cursor")
+        response = await client.get("/api/v1/chat_sessions?user_id=user1&cursor=bad")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
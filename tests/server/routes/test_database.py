@@ -1,7 +1,7 @@
 import unittest
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
 from fastapi.routing import APIRouter
 
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -9,10 +9,17 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from hive_agent.database.schemas import (
     TableCreate,
     DataInsert,
+    DataInsertBatch,
     DataUpdate,
+    DataUpdateWhere,
     DataDelete,
+    DataDeleteWhere,
     DataRead,
+    DataStream,
+    DataAggregate,
+    DataExport,
 )
+from hive_agent.database.database import CsvEncoder
 from hive_agent.server.routes.database import setup_database_routes
 
 
@@ -32,6 +39,21 @@ class TestDatabaseRoutes(unittest.IsolatedAsyncioTestCase):
         )
         result = await router.routes[0].endpoint(table_create, mock_db)
         self.assertEqual(result, {"message": "Table test_table created successfully."})
+        mock_manager_instance.create_table.assert_called_with(
+            "test_table", {"col1": "String", "col2": "Integer"}, None
+        )
+
+        table_create = TableCreate(
+            table_name="test_table",
+            columns={"col1": "String", "col2": "Integer"},
+            indexes=[{"columns": ["col1", "col2"], "unique": True}],
+        )
+        await router.routes[0].endpoint(table_create, mock_db)
+        mock_manager_instance.create_table.assert_called_with(
+            "test_table",
+            {"col1": "String", "col2": "Integer"},
+            [{"columns": ["col1", "col2"], "unique": True}],
+        )
 
         mock_manager_instance.create_table.side_effect = ValueError("Test error")
         with self.assertRaises(HTTPException) as cm:
@@ -66,18 +88,31 @@ class TestDatabaseRoutes(unittest.IsolatedAsyncioTestCase):
         mock_db = AsyncMock(spec=AsyncSession)
         mock_data = [{"col1": "value1", "col2": 2}]
         mock_manager_instance = mock_manager.return_value
-        mock_manager_instance.read_data = AsyncMock(return_value=mock_data)
+        mock_manager_instance.read_page = AsyncMock(return_value=(mock_data, None))
 
         router = APIRouter()
         setup_database_routes(router)
 
         data_read = DataRead(table_name="test_table", filters=None)
-        result = await router.routes[2].endpoint(data_read, mock_db)
+        response = Response()
+        result = await router.routes[2].endpoint(data_read, response, mock_db)
         self.assertEqual(result, mock_data)
+        self.assertNotIn("X-Next-Cursor", response.headers)
 
-        mock_manager_instance.read_data.side_effect = ValueError("Test error")
+        # Test paginated read
+        mock_manager_instance.read_page.return_value = (mock_data, "next")
+        data_read = DataRead(table_name="test_table", limit=1, order_by=["-col2"])
+        response = Response()
+        result = await router.routes[2].endpoint(data_read, response, mock_db)
+        self.assertEqual(result, mock_data)
+        self.assertEqual(response.headers["X-Next-Cursor"], "next")
+        mock_manager_instance.read_page.assert_called_with(
+            "test_table", None, limit=1, order_by=["-col2"], cursor=None, fields=None
+        )
+
+        mock_manager_instance.read_page.side_effect = ValueError("Test error")
         with self.assertRaises(HTTPException) as cm:
-            await router.routes[2].endpoint(data_read, mock_db)
+            await router.routes[2].endpoint(data_read, Response(), mock_db)
         self.assertEqual(cm.exception.status_code, 404)
         self.assertEqual(cm.exception.detail, "Test error")
 
@@ -120,3 +155,319 @@ class TestDatabaseRoutes(unittest.IsolatedAsyncioTestCase):
             await router.routes[4].endpoint(data_delete, mock_db)
         self.assertEqual(cm.exception.status_code, 404)
         self.assertEqual(cm.exception.detail, "Test error")
+
+    @patch("hive_agent.server.routes.database.DatabaseManager")
+    async def test_insert_data_batch_handler(self, mock_manager):
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_manager_instance = mock_manager.return_value
+        mock_manager_instance.insert_many = AsyncMock(return_value=[1, 2])
+
+        router = APIRouter()
+        setup_database_routes(router)
+
+        data_insert = DataInsertBatch(
+            table_name="test_table",
+            data=[{"col1": "value1", "col2": 2}, {"col1": "value2", "col2": 3}],
+        )
+        result = await router.routes[5].endpoint(data_insert, mock_db)
+        self.assertEqual(
+            result, {"message": "Data inserted successfully.", "ids": [1, 2]}
+        )
+
+        mock_manager_instance.insert_many.side_effect = ValueError("Test error")
+        with self.assertRaises(HTTPException) as cm:
+            await router.routes[5].endpoint(data_insert, mock_db)
+        self.assertEqual(cm.exception.status_code, 404)
+        self.assertEqual(cm.exception.detail, "Test error")
+
+    @patch("hive_agent.server.routes.database.DatabaseManager")
+    async def test_read_data_stream_handler(self, mock_manager):
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_manager_instance = mock_manager.return_value
+        mock_manager_instance.validate_read = AsyncMock(
+            return_value={"col1": "String", "col2": "Integer"}
+        )
+
+        async def rows(*args, **kwargs):
+            yield {"col1": "value1", "col2": 2}
+            yield {"col1": "value2", "col2": 3}
+
+        mock_manager_instance.stream_data = rows
+
+        router = APIRouter()
+        setup_database_routes(router)
+
+        data_stream = DataStream(table_name="test_table")
+        result = await router.routes[6].endpoint(data_stream, mock_db)
+        self.assertEqual(result.media_type, "application/x-ndjson")
+        body = [chunk async for chunk in result.body_iterator]
+        self.assertEqual(
+            body,
+            ['{"col1": "value1", "col2": 2}\n', '{"col1": "value2", "col2": 3}\n'],
+        )
+
+        mock_manager_instance.validate_read.assert_called_once_with(
+            "test_table", None, order_by=None, fields=None
+        )
+
+        # Bad requests are refused before the response starts
+        mock_manager_instance.validate_read.side_effect = ValueError(
+            "Unknown column: nope"
+        )
+        with self.assertRaises(HTTPException) as cm:
+            await router.routes[6].endpoint(
+                DataStream(table_name="test_table", filters={"nope": [1]}), mock_db
+            )
+        self.assertEqual(cm.exception.status_code, 404)
+        self.assertEqual(cm.exception.detail, "Unknown column: nope")
+
+    @patch("hive_agent.server.routes.database.DatabaseManager")
+    async def test_update_data_where_handler(self, mock_manager):
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_manager_instance = mock_manager.return_value
+        mock_manager_instance.update_where = AsyncMock(return_value=3)
+
+        router = APIRouter()
+        setup_database_routes(router)
+
+        data_update = DataUpdateWhere(
+            table_name="test_table",
+            filters={"col2": {"lt": 5}},
+            data={"col1": "new_value"},
+        )
+        result = await router.routes[7].endpoint(data_update, mock_db)
+        self.assertEqual(result, {"message": "Data updated successfully.", "count": 3})
+
+        mock_manager_instance.update_where.side_effect = ValueError("Test error")
+        with self.assertRaises(HTTPException) as cm:
+            await router.routes[7].endpoint(data_update, mock_db)
+        self.assertEqual(cm.exception.status_code, 404)
+        self.assertEqual(cm.exception.detail, "Test error")
+
+    @patch("hive_agent.server.routes.database.DatabaseManager")
+    async def test_delete_data_where_handler(self, mock_manager):
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_manager_instance = mock_manager.return_value
+        mock_manager_instance.delete_where = AsyncMock(return_value=2)
+
+        router = APIRouter()
+        setup_database_routes(router)
+
+        data_delete = DataDeleteWhere(
+            table_name="test_table", filters={"col1": ["value1"]}
+        )
+        result = await router.routes[8].endpoint(data_delete, mock_db)
+        self.assertEqual(result, {"message": "Data deleted successfully.", "count": 2})
+
+        mock_manager_instance.delete_where.side_effect = ValueError("Test error")
+        with self.assertRaises(HTTPException) as cm:
+            await router.routes[8].endpoint(data_delete, mock_db)
+        self.assertEqual(cm.exception.status_code, 404)
+        self.assertEqual(cm.exception.detail, "Test error")
+
+    @patch("hive_agent.server.routes.database.DatabaseManager")
+    async def test_aggregate_handler(self, mock_manager):
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_manager_instance = mock_manager.return_value
+        mock_manager_instance.aggregate = AsyncMock(
+            return_value=[{"col1": "value1", "rows": 2, "total": 5}]
+        )
+
+        router = APIRouter()
+        setup_database_routes(router)
+
+        data_aggregate = DataAggregate(
+            table_name="test_table",
+            aggregates={
+                "rows": {"function": "count"},
+                "total": {"function": "sum", "column": "col2"},
+            },
+            filters={"col2": {"gt": 0}},
+            group_by=["col1"],
+        )
+        result = await router.routes[9].endpoint(data_aggregate, mock_db)
+        self.assertEqual(result, [{"col1": "value1", "rows": 2, "total": 5}])
+        mock_manager_instance.aggregate.assert_called_once_with(
+            "test_table",
+            {
+                "rows": {"function": "count", "column": None, "json_type": None},
+                "total": {"function": "sum", "column": "col2", "json_type": None},
+            },
+            {"col2": {"gt": 0}},
+            group_by=["col1"],
+        )
+
+        mock_manager_instance.aggregate.side_effect = ValueError("Test error")
+        with self.assertRaises(HTTPException) as cm:
+            await router.routes[9].endpoint(data_aggregate, mock_db)
+        self.assertEqual(cm.exception.status_code, 404)
+        self.assertEqual(cm.exception.detail, "Test error")
+
+    @patch("hive_agent.server.routes.database.get_history_cache")
+    @patch("hive_agent.server.routes.database.DatabaseManager")
+    async def test_database_stats_handler(self, mock_manager, mock_get_history_cache):
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_get_history_cache.return_value.stats.return_value = {
+            "hits": 3,
+            "misses": 1,
+        }
+        database = mock_manager.return_value.database
+        database.query_stats.snapshot.return_value = {
+            "statements": [],
+            "slow_queries": [],
+        }
+        database.definition_cache.stats.return_value = {"hits": 1, "misses": 1}
+        database.writer = None
+        database.retention = None
+
+        router = APIRouter()
+        setup_database_routes(router)
+
+        result = await router.routes[10].endpoint(mock_db)
+        self.assertEqual(
+            result,
+            {
+                "queries": {"statements": [], "slow_queries": []},
+                "definition_cache": {"hits": 1, "misses": 1},
+                "write_behind": None,
+                "retention": None,
+                "chat_history_cache": {"hits": 3, "misses": 1},
+            },
+        )
+        mock_get_history_cache.assert_called_once_with(database)
+
+    @patch("hive_agent.server.routes.database.DatabaseManager")
+    async def test_export_data_handler(self, mock_manager):
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_manager_instance = mock_manager.return_value
+        mock_manager_instance.get_table_definition = AsyncMock(
+            return_value={"col1": "String", "col2": "Integer"}
+        )
+        mock_manager_instance.export_encoder.return_value = CsvEncoder(
+            {"col1": "String"}
+        )
+        mock_manager_instance.validate_read = AsyncMock()
+        calls = []
+
+        async def chunks(*args, **kwargs):
+            calls.append((args, kwargs))
+            yield b"col1\r\n"
+            yield b"value1\r\n"
+
+        mock_manager_instance.export_data = chunks
+
+        router = APIRouter()
+        setup_database_routes(router)
+
+        data_export = DataExport(
+            table_name="test_table",
+            format="csv",
+            fields=["col1"],
+            filters={"col2": [2]},
+            batch_size=500,
+        )
+        result = await router.routes[11].endpoint(data_export, mock_db)
+        self.assertEqual(result.media_type, "text/csv")
+        self.assertEqual(
+            result.headers["content-disposition"],
+            'attachment; filename="test_table.csv"',
+        )
+        body = [chunk async for chunk in result.body_iterator]
+        self.assertEqual(body, [b"col1\r\n", b"value1\r\n"])
+        self.assertEqual(
+            calls,
+            [
+                (
+                    ("test_table", "csv", {"col2": [2]}),
+                    {"order_by": None, "fields": ["col1"], "batch_size": 500},
+                )
+            ],
+        )
+        mock_manager_instance.validate_read.assert_called_once_with(
+            "test_table", {"col2": [2]}, order_by=None, fields=["col1"]
+        )
+
+        # Bad filters are refused before the response starts
+        mock_manager_instance.validate_read.side_effect = ValueError(
+            "Unknown column: nope"
+        )
+        with self.assertRaises(HTTPException) as cm:
+            await router.routes[11].endpoint(
+                DataExport(table_name="test_table", filters={"nope": [1]}), mock_db
+            )
+        self.assertEqual(cm.exception.status_code, 400)
+        self.assertEqual(cm.exception.detail, "Unknown column: nope")
+
+        mock_manager_instance.export_encoder.side_effect = ValueError(
+            "Unsupported export format: xml"
+        )
+        with self.assertRaises(HTTPException) as cm:
+            await router.routes[11].endpoint(
+                DataExport(table_name="test_table", format="xml"), mock_db
+            )
+        self.assertEqual(cm.exception.status_code, 400)
+
+        mock_manager_instance.get_table_definition.return_value = None
+        with self.assertRaises(HTTPException) as cm:
+            await router.routes[11].endpoint(data_export, mock_db)
+        self.assertEqual(cm.exception.status_code, 404)
+
+    @patch("hive_agent.server.routes.database.DatabaseManager")
+    async def test_import_data_handler(self, mock_manager):
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_manager_instance = mock_manager.return_value
+        mock_manager_instance.get_table_definition = AsyncMock(
+            return_value={"col1": "String"}
+        )
+        calls = []
+
+        async def events(table_name, chunks, format, batch_size):
+            calls.append(
+                (table_name, [chunk async for chunk in chunks], format, batch_size)
+            )
+            yield {"rows": 2, "inserted": 2, "rejected": 0, "done": False}
+            yield {"rows": 2, "inserted": 2, "rejected": 0, "done": True, "errors": []}
+
+        mock_manager_instance.import_data = events
+
+        async def body():
+            yield b"col1\nvalue1\n"
+            yield b"value2\n"
+
+        request = MagicMock()
+        request.headers = {"content-type": "text/csv; charset=utf-8"}
+        request.stream = body
+
+        router = APIRouter()
+        setup_database_routes(router)
+
+        result = await router.routes[12].endpoint(
+            request, "test_table", None, 100, mock_db
+        )
+        self.assertEqual(
+            result,
+            {"rows": 2, "inserted": 2, "rejected": 0, "done": True, "errors": []},
+        )
+        self.assertEqual(
+            calls, [("test_table", [b"col1\nvalue1\n", b"value2\n"], "csv", 100)]
+        )
+
+        request.headers = {}
+        with self.assertRaises(HTTPException) as cm:
+            await router.routes[12].endpoint(request, "test_table", None, 100, mock_db)
+        self.assertEqual(cm.exception.status_code, 400)
+
+        mock_manager_instance.import_data = MagicMock(
+            side_effect=ValueError("Test error")
+        )
+        with self.assertRaises(HTTPException) as cm:
+            await router.routes[12].endpoint(
+                request, "test_table", "ndjson", 100, mock_db
+            )
+        self.assertEqual(cm.exception.status_code, 400)
+        self.assertEqual(cm.exception.detail, "Test error")
+
+        mock_manager_instance.get_table_definition.return_value = None
+        with self.assertRaises(HTTPException) as cm:
+            await router.routes[12].endpoint(request, "test_table", "csv", 100, mock_db)
+        self.assertEqual(cm.exception.status_code, 404)
@@ -255,6 +255,32 @@ async def test_chat_method_error_handling(agent):
         assert str(exc_info.value) == "Test error"
 
 
+@pytest.mark.asyncio
+async def test_stream_chat_method(agent):
+    agent.sdk_context.get_utility = MagicMock()
+    mock_db_manager = MagicMock()
+    agent.sdk_context.get_utility.return_value = mock_db_manager
+    agent._ensure_utilities_loaded = AsyncMock()
+
+    async def stream_response(db_manager, last_message, image_document_paths):
+        for token in ("Hel", "lo"):
+            yield token
+
+    with patch("hive_agent.agent.ChatManager", autospec=True) as mock_chat_manager_class:
+        mock_chat_manager_instance = mock_chat_manager_class.return_value
+        mock_chat_manager_instance.stream_response = MagicMock(side_effect=stream_response)
+
+        tokens = [token async for token in agent.stream_chat("Hi", user_id="custom_user", session_id="custom_session")]
+
+        assert tokens == ["Hel", "lo"]
+        mock_chat_manager_class.assert_called_with(
+            agent._HiveAgent__agent, user_id="custom_user", session_id="custom_session"
+        )
+        mock_chat_manager_instance.stream_response.assert_called_once_with(
+            mock_db_manager, ChatMessage(role=MessageRole.USER, content="Hi"), []
+        )
+
+
 @pytest.mark.asyncio
 async def test_chat_history_method(agent):
     agent.sdk_context.get_utility = MagicMock()
@@ -280,7 +306,9 @@ async def test_chat_history_method(agent):
 
         agent.sdk_context.get_utility.assert_called_once_with("db_manager")
 
-        mock_chat_manager_instance.get_all_chats_for_user.assert_awaited_once_with(mock_db_manager)
+        mock_chat_manager_instance.get_all_chats_for_user.assert_awaited_once_with(
+            mock_db_manager, since=None, until=None
+        )
 
         expected_chat_history = {
             "default_chat": [
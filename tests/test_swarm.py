@@ -116,6 +116,22 @@ async def test_chat(basic_swarm, mock_sdk_context):
         mock_chat_manager.generate_response.assert_called_once()
 
 
+@pytest.mark.asyncio
+async def test_stream_chat(basic_swarm, mock_sdk_context):
+    async def stream_response(db_manager, last_message, image_document_paths):
+        yield "Test "
+        yield "response"
+
+    mock_chat_manager = MagicMock(spec=ChatManager)
+    mock_chat_manager.stream_response = MagicMock(side_effect=stream_response)
+
+    with patch('hive_agent.swarm.ChatManager', return_value=mock_chat_manager):
+        tokens = [token async for token in basic_swarm.stream_chat(prompt="Test prompt", user_id="test_user")]
+
+        assert tokens == ["Test ", "response"]
+        mock_chat_manager.stream_response.assert_called_once()
+
+
 @pytest.mark.asyncio
 async def test_chat_history(basic_swarm, mock_sdk_context):
     mock_chat_manager = AsyncMock(spec=ChatManager)